@@ -1,19 +1,15 @@
-def calculate_fuel_mass_flows(power_output_kW, efficiency, des):
-    """
-    Calculates fuel mass flows from power output, efficiency, and diesel energy share.
+# Constants (Lower Heating Values in MJ/kg)
+PCI_diesel = 42.7
+PCI_ch4 = 50.03
 
-    Parameters:
-    - power_output_kW: float, electrical power output [kW]
-    - efficiency: float, electrical efficiency (e.g. 0.30)
-    - des: float, Diesel Energy Share (0–1)
 
-    Returns:
-    - dict with total energy input and mass flows for Diesel & CH4
+def fuel_mass_flows(power_output_kW, efficiency, des):
     """
+    Unrounded fuel mass flows; works element-wise on floats or numpy arrays.
 
-    # Constants (Lower Heating Values in MJ/kg)
-    PCI_diesel = 42.7
-    PCI_ch4 = 50.03
+    Returns:
+    - tuple (Q_total, Q_diesel, Q_ch4, m_diesel, m_ch4) in MJ/h and kg/h
+    """
 
     # 1. Total energy input (MJ/h)
     Q_total = power_output_kW / efficiency * 3.6
@@ -26,10 +22,27 @@ def calculate_fuel_mass_flows(power_output_kW, efficiency, des):
     m_diesel = Q_diesel / PCI_diesel
     m_ch4 = Q_ch4 / PCI_ch4
 
+    return Q_total, Q_diesel, Q_ch4, m_diesel, m_ch4
+
+
+def calculate_fuel_mass_flows(power_output_kW, efficiency, des):
+    """
+    Calculates fuel mass flows from power output, efficiency, and diesel energy share.
+
+    Parameters:
+    - power_output_kW: float, electrical power output [kW]
+    - efficiency: float, electrical efficiency (e.g. 0.30)
+    - des: float, Diesel Energy Share (0–1)
+
+    Returns:
+    - dict with total energy input and mass flows for Diesel & CH4
+    """
+    Q_total, Q_diesel, Q_ch4, m_diesel, m_ch4 = fuel_mass_flows(power_output_kW, efficiency, des)
+
     return {
         "Q_total_MJ_h": round(Q_total, 2),
         "Q_diesel_MJ_h": round(Q_diesel, 2),
         "Q_ch4_MJ_h": round(Q_ch4, 2),
         "diesel_mass_flow_kg_h": round(m_diesel, 2),
         "ch4_mass_flow_kg_h": round(m_ch4, 2)
-    }
\ No newline at end of file
+    }
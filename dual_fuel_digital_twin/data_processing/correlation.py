@@ -2,6 +2,28 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+def draw_correlation_heatmap(ax, corr_matrix, title="Correlation Matrix"):
+    """
+    Zeichnet die Korrelationsmatrix als annotierte Heatmap in eine Achse.
+    """
+    sns.heatmap(
+        corr_matrix,
+        ax=ax,
+        annot=True,
+        fmt=".2f",
+        cmap="coolwarm",
+        square=True,
+        annot_kws={"size": 8},  # 🧠 kleinere Werte
+        cbar_kws={"label": "Correlation Coefficient"}
+    )
+
+    ax.set_title(title, fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45, labelsize=8)
+    ax.tick_params(axis='y', labelrotation=0, labelsize=8)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+
+
 def analyze_dataframe_correlation(df, title="Correlation Matrix"):
     """
     Berechnet und visualisiert die Korrelationsmatrix für einen DataFrame
@@ -20,21 +42,9 @@ def analyze_dataframe_correlation(df, title="Correlation Matrix"):
     corr_matrix = numeric_df.corr()
 
     # --- Heatmap-Plot ---
-    plt.figure(figsize=(14, 10))
-    sns.heatmap(
-        corr_matrix,
-        annot=True,
-        fmt=".2f",
-        cmap="coolwarm",
-        square=True,
-        annot_kws={"size": 8},  # 🧠 kleinere Werte
-        cbar_kws={"label": "Correlation Coefficient"}
-    )
-
-    plt.title(title, fontsize=12)
-    plt.xticks(rotation=45, ha='right', fontsize=8)
-    plt.yticks(rotation=0, fontsize=8)
-    plt.tight_layout()
+    fig, ax = plt.subplots(figsize=(14, 10))
+    draw_correlation_heatmap(ax, corr_matrix, title)
+    fig.tight_layout()
     plt.show()
 
     # --- Top-3-Korrelationen ---
@@ -0,0 +1,67 @@
+from data_processing.lod_scatter import build_measured_layers
+
+
+def draw_dashboard_panels(fig, df, power, des_percent, predicted_eff, mass_flows, predicted_temp,
+                          layers=None):
+    """
+    Draws the three dashboard panels (efficiency, mass flows, exhaust
+    temperature vs power) into an existing Figure. Used by the interactive
+    GUI and the headless report.
+
+    Parameters:
+        fig (Figure): target figure, should be empty
+        df (DataFrame): measured data with power_output, efficiency_electric,
+            diesel_mass_flow, ch4_mass_flow_calc and exhaust_temp
+        power (float): predicted operating point power [kW]
+        des_percent (float): Diesel Energy Share [%]
+        predicted_eff (float): predicted electrical efficiency (e.g. 0.30)
+        mass_flows (dict): result of calculate_fuel_mass_flows
+        predicted_temp (float): predicted exhaust temperature [°C]
+        layers (dict): measured layers from build_measured_layers; pass them
+            to avoid rebuilding the density grids on every update
+    """
+    if layers is None:
+        layers = build_measured_layers(df)
+
+    ax1 = fig.add_subplot(1, 3, 1)
+    ax2 = fig.add_subplot(1, 3, 2)
+    ax3 = fig.add_subplot(1, 3, 3)
+
+    # Plot 1: Efficiency
+    ax1.set_xlim(0, 15)
+    ax1.set_ylim(0, 25)
+    layers["efficiency_electric"].draw(ax1)
+    ax1.scatter(power, predicted_eff * 100, color="blue", marker='X', s=100, label="Predicted")
+    ax1.set_title("Efficiency vs Power")
+    ax1.set_xlabel("Power [kW]")
+    ax1.set_ylabel("Efficiency [%]")
+    ax1.grid(True)
+    ax1.legend()
+
+    # Plot 2: Mass Flows
+    ax2.set_xlim(0, 15)
+    ax2.set_ylim(0, 10)
+    layers["diesel_mass_flow"].draw(ax2)
+    layers["ch4_mass_flow_calc"].draw(ax2)
+    ax2.scatter(power, mass_flows["diesel_mass_flow_kg_h"],
+                color="saddlebrown", marker='X', s=100, label="Diesel Predicted")
+    ax2.scatter(power, mass_flows["ch4_mass_flow_kg_h"],
+                color="darkgreen", marker='X', s=100, label="CH₄ Predicted")
+    ax2.annotate(f"DES: {des_percent:.1f}%", (power, mass_flows["diesel_mass_flow_kg_h"]),
+                 textcoords="offset points", xytext=(5, -15), fontsize=9)
+    ax2.set_title("Mass Flows vs Power")
+    ax2.set_xlabel("Power [kW]")
+    ax2.set_ylabel("Mass Flow [kg/h]")
+    ax2.grid(True)
+    ax2.legend()
+
+    # Plot 3: Exhaust Temp
+    ax3.set_xlim(0, 15)
+    ax3.set_ylim(df["exhaust_temp"].min() - 10, df["exhaust_temp"].max() + 10)
+    layers["exhaust_temp"].draw(ax3)
+    ax3.scatter(power, predicted_temp, color="darkorange", marker='X', s=100, label="Predicted")
+    ax3.set_title("Exhaust Temp vs Power")
+    ax3.set_xlabel("Power [kW]")
+    ax3.set_ylabel("Exhaust Temp [°C]")
+    ax3.grid(True)
+    ax3.legend()
@@ -0,0 +1,228 @@
+"""
+Streaming drift and anomaly detection on the residuals of the twin.
+
+A channel is one predicted/measured pair, e.g. the exhaust temperature of
+one engine. All channels are held in flat numpy arrays and every statistic
+is a recursive update, so each sample costs O(1) work and memory per
+channel and one update call processes all channels at once.
+
+Per channel the residual (measured - predicted) is standardised with a
+reference mean and standard deviation learned during a warm-up period.
+Three detectors then run on the standardised residual z:
+
+- EWMA: exponentially weighted mean of z, alarms on a slow shift
+  (e.g. efficiency degradation)
+- CUSUM: two-sided cumulative sum, alarms on a small persistent step
+  (e.g. an injector drifting off)
+- quantiles: lower/upper quantile of z tracked by stochastic approximation,
+  an exponentially forgetting stand-in for a rolling quantile that needs no
+  window buffer; alarms when the tails move out (e.g. exhaust excursions)
+
+An alert is reported when a detector enters its alarm state, not on every
+sample it stays there. The warm-up has to be long enough that the error of
+the reference mean is small against the EWMA limit, otherwise channels with
+an unlucky reference sit in alarm permanently.
+"""
+import numpy as np
+
+# Quantities compared per engine, see replay.REPLAY_QUANTITIES
+DRIFT_QUANTITIES = ['efficiency_electric', 'diesel_mass_flow', 'ch4_mass_flow', 'exhaust_temp']
+
+DETECTORS = ('ewma', 'cusum_high', 'cusum_low', 'quantile_high', 'quantile_low')
+
+
+def twin_channel_names(engine_ids, quantities=None):
+    """
+    Returns the channel names '<engine>/<quantity>' in the order the
+    detector expects them: all quantities of the first engine, then the next.
+    """
+    quantities = DRIFT_QUANTITIES if quantities is None else quantities
+    return [f"{engine}/{quantity}" for engine in engine_ids for quantity in quantities]
+
+
+class ResidualDriftDetector:
+    """
+    EWMA, CUSUM and quantile drift detection for many residual channels.
+
+    Parameters:
+        channels (int or list): number of channels or their names
+        warmup (int): samples per channel used to learn the reference
+            mean/std before any alarm is raised, taken from a healthy period
+        ewma_lambda (float): EWMA weight of the newest sample
+        ewma_limit (float): alarm limit in standard deviations of the EWMA
+        cusum_k (float): CUSUM allowance in reference standard deviations
+        cusum_h (float): CUSUM decision interval in reference standard deviations
+        quantile_levels (tuple): (lower, upper) tracked quantile levels
+        quantile_limit (float): alarm when a tracked quantile of z is beyond ±limit
+        quantile_rate (float): step size of the quantile tracker
+        min_std (float or array): floor for the reference std, per channel or global
+    """
+
+    def __init__(self, channels, warmup=500, ewma_lambda=0.05, ewma_limit=4.0,
+                 cusum_k=0.5, cusum_h=8.0, quantile_levels=(0.05, 0.95),
+                 quantile_limit=3.0, quantile_rate=0.02, min_std=1e-6):
+        if isinstance(channels, int):
+            self.names = [str(i) for i in range(channels)]
+        else:
+            self.names = list(channels)
+        n = len(self.names)
+
+        self.warmup = warmup
+        self.ewma_lambda = ewma_lambda
+        self.ewma_limit = ewma_limit * np.sqrt(ewma_lambda / (2 - ewma_lambda))
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.quantile_levels = quantile_levels
+        self.quantile_limit = quantile_limit
+        self.quantile_rate = quantile_rate
+        self.min_std = np.broadcast_to(np.asarray(min_std, dtype=float), (n,)).copy()
+
+        # Warm-up (Welford) and reference
+        self.count = np.zeros(n, dtype=np.int64)
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+        self.ref_mean = np.zeros(n)
+        self.ref_std = np.ones(n)
+
+        # Detector states
+        self.ewma = np.zeros(n)
+        self.cusum_high = np.zeros(n)
+        self.cusum_low = np.zeros(n)
+        self.quantile_low = np.zeros(n)
+        self.quantile_high = np.zeros(n)
+        self.in_alarm = {detector: np.zeros(n, dtype=bool) for detector in DETECTORS}
+        self.samples = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def armed(self):
+        """Channels whose warm-up is complete."""
+        return self.count >= self.warmup
+
+    def update(self, predicted, measured):
+        """
+        Feeds one sample for every channel. Non-finite pairs are ignored for
+        that channel.
+
+        Parameters:
+            predicted, measured (array-like): one value per channel
+
+        Returns:
+            list of alerts, each a dict with 'channel', 'detector', 'value'
+            and 'sample' (empty when nothing fired)
+        """
+        residual = np.asarray(measured, dtype=float) - np.asarray(predicted, dtype=float)
+        valid = np.isfinite(residual)
+        self.samples += 1
+
+        # --- 1. Warm-up: learn the reference ---
+        learning = valid & (self.count < self.warmup)
+        if learning.any():
+            self.count[learning] += 1
+            delta = np.where(learning, residual - self._mean, 0.0)
+            self._mean += delta / np.maximum(self.count, 1)
+            self._m2 += delta * np.where(learning, residual - self._mean, 0.0)
+
+            done = learning & (self.count == self.warmup)
+            if done.any():
+                self.ref_mean[done] = self._mean[done]
+                std = np.sqrt(self._m2[done] / max(self.warmup - 1, 1))
+                self.ref_std[done] = np.maximum(std, self.min_std[done])
+                self.quantile_low[done] = 0.0
+                self.quantile_high[done] = 0.0
+
+        active = valid & ~learning & self.armed
+        if not active.any():
+            return []
+
+        # --- 2. Detectors on the standardised residual ---
+        with np.errstate(invalid='ignore'):
+            z = np.where(active, (residual - self.ref_mean) / self.ref_std, 0.0)
+
+        lam = self.ewma_lambda
+        self.ewma = np.where(active, lam * z + (1 - lam) * self.ewma, self.ewma)
+        self.cusum_high = np.where(active, np.maximum(0.0, self.cusum_high + z - self.cusum_k),
+                                   self.cusum_high)
+        self.cusum_low = np.where(active, np.maximum(0.0, self.cusum_low - z - self.cusum_k),
+                                  self.cusum_low)
+
+        low, high = self.quantile_levels
+        step = self.quantile_rate
+        self.quantile_low = np.where(active, self.quantile_low + step * (low - (z < self.quantile_low)),
+                                     self.quantile_low)
+        self.quantile_high = np.where(active, self.quantile_high + step * (high - (z < self.quantile_high)),
+                                      self.quantile_high)
+
+        # --- 3. Alarms ---
+        fired = {
+            'ewma': active & (np.abs(self.ewma) > self.ewma_limit),
+            'cusum_high': active & (self.cusum_high > self.cusum_h),
+            'cusum_low': active & (self.cusum_low > self.cusum_h),
+            'quantile_high': active & (self.quantile_high > self.quantile_limit),
+            'quantile_low': active & (self.quantile_low < -self.quantile_limit)
+        }
+        alerts = []
+        for detector, mask in fired.items():
+            # Inactive channels keep their alarm state
+            rising = mask & ~self.in_alarm[detector]
+            self.in_alarm[detector] = np.where(active, mask, self.in_alarm[detector])
+            if not rising.any():
+                continue
+            state = getattr(self, detector)
+            for channel in np.flatnonzero(rising):
+                alerts.append({
+                    'channel': self.names[channel],
+                    'detector': detector,
+                    'value': float(state[channel]),
+                    'sample': self.samples
+                })
+        # A CUSUM restarts after its alarm so a persistent shift alarms again later
+        self.cusum_high[fired['cusum_high']] = 0.0
+        self.cusum_low[fired['cusum_low']] = 0.0
+        self.in_alarm['cusum_high'][fired['cusum_high']] = False
+        self.in_alarm['cusum_low'][fired['cusum_low']] = False
+        return alerts
+
+    def update_batch(self, predicted, measured):
+        """
+        Feeds a block of samples, shape (samples, channels), in time order.
+        Returns the alerts of all samples.
+        """
+        predicted = np.atleast_2d(np.asarray(predicted, dtype=float))
+        measured = np.atleast_2d(np.asarray(measured, dtype=float))
+        alerts = []
+        for row_predicted, row_measured in zip(predicted, measured):
+            alerts.extend(self.update(row_predicted, row_measured))
+        return alerts
+
+    def reset(self, channels=None):
+        """
+        Forgets the reference and detector state of the given channel
+        indices (all when None), e.g. after maintenance of an engine.
+        """
+        index = slice(None) if channels is None else np.asarray(channels)
+        for state in (self._mean, self._m2, self.ref_mean, self.ewma, self.cusum_high,
+                      self.cusum_low, self.quantile_low, self.quantile_high):
+            state[index] = 0.0
+        self.count[index] = 0
+        self.ref_std[index] = 1.0
+        for flags in self.in_alarm.values():
+            flags[index] = False
+
+    def state(self):
+        """
+        Returns the current statistics per channel as a dict of arrays.
+        """
+        return {
+            'channel': list(self.names),
+            'count': self.count.copy(),
+            'ref_mean': self.ref_mean.copy(),
+            'ref_std': self.ref_std.copy(),
+            'ewma': self.ewma.copy(),
+            'cusum_high': self.cusum_high.copy(),
+            'cusum_low': self.cusum_low.copy(),
+            'quantile_low': self.quantile_low.copy(),
+            'quantile_high': self.quantile_high.copy()
+        }
@@ -1,11 +1,10 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# File paths to both Excel files
-file_paths = [
-    "data/raw/24-07-19_Engine mapping 2.xlsx",
-    "data/raw/24-06-26_Engine mapping 1.xlsx"
-]
+from data_processing.extract_excel_data import list_raw_workbooks
+
+# All workbooks in data/raw
+file_paths = list_raw_workbooks()
 
 # Excel column indices: K (10), M (12), O (14), Q (16), U (20)
 col_indices = [10, 12, 14, 16, 20]
@@ -1,11 +1,10 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# File paths to both Excel files
-file_paths = [
-    "data/raw/24-07-19_Engine mapping 2.xlsx",
-    "data/raw/24-06-26_Engine mapping 1.xlsx"
-]
+from data_processing.extract_excel_data import list_raw_workbooks
+
+# All workbooks in data/raw
+file_paths = list_raw_workbooks()
 
 # Column indices for B to S and Q
 row26_indices = list(range(1, 19))  # Columns B to S (indices 1–18)
@@ -14,7 +13,6 @@ efficiency_col_index = 16           # Column Q for η elec (%)
 # Containers
 row26_data = []
 efficiencies = []
-labels = None
 
 # Process each sheet in both files
 for file_path in file_paths:
@@ -22,23 +20,23 @@ for file_path in file_paths:
     for sheet_name in xls.sheet_names:
         df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
         try:
-            if labels is None:
-                labels = df.iloc[3, row26_indices].tolist()  # Row 4 = labels
-
+            # Row 4 = labels, per sheet: the column order differs between workbooks
+            labels = df.iloc[3, row26_indices].tolist()
             values = df.iloc[25, row26_indices].tolist()     # Row 26 = feature values
             eff = df.iloc[1, efficiency_col_index]           # Q2 = η elec (%)
 
-            row26_data.append(values)
+            row26_data.append(dict(zip(labels, values)))
             efficiencies.append(eff)
         except IndexError:
             continue
 
 # Create DataFrame
-row26_df = pd.DataFrame(row26_data, columns=labels)
+row26_df = pd.DataFrame(row26_data)
 eff_series = pd.Series(efficiencies, name="η elec (%)")
 
 # Plot subplots: η elec (%) vs each B–S column (row 26)
-fig, axes = plt.subplots(3, 6, figsize=(18, 9))
+n_rows = -(-len(row26_df.columns) // 6)
+fig, axes = plt.subplots(n_rows, 6, figsize=(18, 3 * n_rows))
 axes = axes.flatten()
 
 for i, feature in enumerate(row26_df.columns):
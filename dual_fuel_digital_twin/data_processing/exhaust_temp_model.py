@@ -1,5 +1,5 @@
 import numpy as np
-    from sklearn.linear_model import LinearRegression
+from sklearn.linear_model import LinearRegression
 
 def train_exhaust_temp_model(df):
     """
@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+
+from data_processing.multi_output_model import (
+    FEATURE_COLUMNS, TARGET_COLUMNS, train_multi_output_surrogate
+)
+from data_processing.steady_state import select_steady_state
+from data_processing.twin_runtime import ARTIFACT_FORMAT, ARTIFACT_VERSION, predict_knn
+
+
+def export_surrogate(pipeline):
+    """
+    Converts the fitted multi-output surrogate (StandardScaler +
+    NanAwareKNeighborsRegressor, see multi_output_model) into plain Python
+    lists and numbers. Missing target values are stored as None (null).
+    """
+    scaler = pipeline.named_steps['scaler']
+    knn = pipeline.named_steps['knn']
+
+    if knn.weights not in ('uniform', 'distance'):
+        raise ValueError(f"Unsupported KNN weights: {knn.weights!r}")
+    if knn.metric != 'minkowski':
+        raise ValueError(f"Unsupported KNN metric: {knn.metric!r}")
+
+    # The fitted estimator keeps its (already scaled) training data
+    x_scaled = np.asarray(knn._fit_X, dtype=float)
+    y = np.asarray(knn._y_missing, dtype=float).reshape(len(x_scaled), -1)
+
+    return {
+        "type": "knn_multi_output",
+        "features": list(FEATURE_COLUMNS),
+        "targets": list(TARGET_COLUMNS),
+        "scaler_mean": scaler.mean_.astype(float).tolist(),
+        "scaler_scale": scaler.scale_.astype(float).tolist(),
+        "n_neighbors": int(knn.n_neighbors),
+        "weights": knn.weights,
+        "p": knn.p,
+        "x": x_scaled.tolist(),
+        # One list per target
+        "y": [[float(v) if np.isfinite(v) else None for v in column] for column in y.T]
+    }
+
+
+def knn_parity(pipeline, exported, n_grid=41):
+    """
+    Compares the runtime surrogate with sklearn on every training point,
+    where ties occur, and on an n_grid x n_grid sweep over the training
+    range.
+
+    Returns:
+        dict with the maximum absolute deviation over all targets, the
+        number of points where a target differs by more than 1e-9 and the
+        number of points compared
+    """
+    scaler = pipeline.named_steps['scaler']
+    x_train = np.asarray(exported["x"]) * scaler.scale_ + scaler.mean_
+    grid = np.meshgrid(*(np.linspace(lo, hi, n_grid) for lo, hi in zip(x_train.min(0), x_train.max(0))))
+    x = np.unique(np.vstack([x_train, np.column_stack([g.ravel() for g in grid])]), axis=0)
+
+    expected = pipeline.predict(x)
+    actual = np.array([predict_knn(exported, point) for point in x.tolist()])
+    deviation = np.abs(actual - expected)
+    return {
+        "max_abs_deviation": float(deviation.max()),
+        "points_deviating": int((deviation > 1e-9).any(axis=1).sum()),
+        "points_compared": int(len(x))
+    }
+
+
+def export_twin_artifact(surrogate, path="outputs/twin_artifact.json"):
+    """
+    Writes the fitted multi-output surrogate to a dependency-free JSON
+    artifact that can be loaded with data_processing.twin_runtime on the
+    engine controller.
+
+    Parameters:
+        surrogate (Pipeline): fitted with train_multi_output_surrogate
+        path (str): target file
+
+    Returns:
+        dict: the exported artifact; 'twin_parity' holds the measured
+        deviation of the runtime from sklearn (see knn_parity)
+    """
+    twin_model = export_surrogate(surrogate)
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "twin_model": twin_model,
+        "twin_parity": knn_parity(surrogate, twin_model)
+    }
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(artifact, file, separators=(',', ':'))
+
+    return artifact
+
+
+def export_twin_artifact_from_dataframe(df, path="outputs/twin_artifact.json"):
+    """
+    Fits the multi-output surrogate on the steady-state rows of the cleaned
+    DataFrame, as the GUI and the report do, and exports it to a runtime
+    artifact.
+    """
+    surrogate = train_multi_output_surrogate(select_steady_state(df))
+    return export_twin_artifact(surrogate, path)
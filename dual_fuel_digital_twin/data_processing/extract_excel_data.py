@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
 import os
+import re
+import json
+import hashlib
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
 
 # Konstanten
 PCI_diesel = 42.7
@@ -9,38 +15,95 @@ rho_ch4 = 0.016
 Vm_ch4 = 0.0224
 cp_water = 4.18  # kJ/kg·K → MJ/kg·K = 0.00418
 
-def create_final_dataframe():
-    file_paths = [
-        "data/raw/24-07-19_Engine mapping 2.xlsx",
-        "data/raw/24-06-26_Engine mapping 1.xlsx"
-    ]
+# Ablage
+RAW_DATA_DIR = "data/raw"
+OUTPUT_DIR = "outputs"
+DATASET_PATH = os.path.join(OUTPUT_DIR, "digital_twin_dataset.csv")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "ingest_manifest.json")
+RAW_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+MANIFEST_VERSION = 1
 
-    def extract_all_sheets_to_dataframe(file_paths):
-        all_data = []
-        for file_path in file_paths:
-            excel_file = pd.ExcelFile(file_path)
-            for sheet in excel_file.sheet_names:
-                try:
-                    df = excel_file.parse(sheet, skiprows=2)
-                    df.columns = df.iloc[0]
-                    df = df[1:]
-                    df = df.loc[:, ~df.columns.duplicated()]
-                    df = df.dropna(axis=1, how='all')
-                    df = df.dropna(how='all')
-                    df['Sheet'] = sheet
-                    all_data.append(df)
-                except Exception as e:
-                    print(f"⚠️ Fehler bei {sheet} in {file_path}: {e}")
-        combined_df = pd.concat(all_data, ignore_index=True)
-        first_col = combined_df.columns[0]
-        combined_df = combined_df[~combined_df[first_col].astype(str).str.contains(
-            "mittel|moyenne|average|ø", case=False, na=False)]
-        return combined_df
-
-    # Daten einlesen & vorbereiten
-    combined_df = extract_all_sheets_to_dataframe(file_paths)
+# Spaltennamen umbenennen
+rename_columns = {
+    '% vanne gaz': "gas_valve_position_percent",
+    'AT09(%CH4)': "measured_ch4_percent",
+    'ET12(V)': "voltage",
+    'FT05(kg/h)': "diesel_mass_flow",
+    'FT07(l/min)': "water_flow",
+    'FT08(ln/min)': "ch4_volumeflow_raw",
+    'IT13(A)': "current_phase_1",
+    'IT15(A)': "current_phase_2",
+    'JT11(kW)': "power_output",
+    'PT04(bar abs)': "boost_pressure",
+    'PT16(bar abs)': "exhaust_pressure",
+    'Q CH4(ln/min)': "ch4_volumeflow",
+    'Q CO2gd(ln/min)': "co2_volumeflow_raw",
+    'Q CO2pd(ln/min)': "co2_volumeflow_processed",
+    'ST14(Hz)': "generator_frequency",
+    'TE02(°C)': "cooling_water_out_temp",
+    'TE03(°C)': "cooling_water_in_temp",
+    'TE10(°C)': "exhaust_temp",
+    '% CH4 réel': "calculated_ch4_share_percent",
+    'ṁ CH4 (kg/h) Formel': "ch4_mass_flow_calc",
+    'DES (%)': "des_percent",
+    'η elec (%)': "efficiency_electric",
+    'η therm (%)': "efficiency_thermal",
+    'Sheet': "sheet"
+}
+
+# 18 Messspalten + 5 berechnete Spalten + Sheet (nicht jede Arbeitsmappe hat alle Messspalten)
+mess_spalten = sorted(col for col in rename_columns if col not in [
+    '% CH4 réel', 'ṁ CH4 (kg/h) Formel', 'DES (%)', 'η elec (%)', 'η therm (%)', 'Sheet'
+])
+final_cols = mess_spalten + [
+    '% CH4 réel', 'ṁ CH4 (kg/h) Formel', 'DES (%)', 'η elec (%)', 'η therm (%)', 'Sheet'
+]
+
+
+def list_raw_workbooks(raw_dir=RAW_DATA_DIR):
+    """
+    Returns the paths of all Excel workbooks in raw_dir, sorted by name.
+    Excel lock files (~$...) are ignored.
+    """
+    return sorted(
+        os.path.join(raw_dir, name) for name in os.listdir(raw_dir)
+        if name.lower().endswith(RAW_EXTENSIONS) and not name.startswith('~$')
+    )
+
+
+def parse_sheet(excel_file, sheet):
+    """
+    Liest ein Messblatt (Kopfzeile in Zeile 4) als Rohdaten-DataFrame.
+    """
+    df = excel_file.parse(sheet, skiprows=2)
+    df.columns = df.iloc[0]
+    df = df[1:]
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.dropna(axis=1, how='all')
+    df = df.dropna(how='all')
+    df['Sheet'] = sheet
+    return df
+
+
+def clean_sheet_data(raw_frames):
+    """
+    Bereinigt eingelesene Messblätter und berechnet die abgeleiteten Größen.
+
+    Parameter:
+    - raw_frames: Liste von DataFrames aus parse_sheet
+
+    Rückgabe:
+    - DataFrame mit den 24 umbenannten Spalten
+    """
+    combined_df = pd.concat(raw_frames, ignore_index=True)
+    first_col = combined_df.columns[0]
+    combined_df = combined_df[~combined_df[first_col].astype(str).str.contains(
+        "mittel|moyenne|average|ø", case=False, na=False)]
+
+    # Daten vorbereiten
     combined_df.dropna(how='all', inplace=True)
     combined_df = combined_df.loc[:, ~combined_df.columns.str.contains("zeit|time", case=False, na=False)]
+    combined_df = combined_df.reindex(columns=combined_df.columns.union(mess_spalten, sort=False))
     numeric_cols = combined_df.columns.difference(['Sheet'])
     combined_df[numeric_cols] = combined_df[numeric_cols].apply(pd.to_numeric, errors='coerce')
 
@@ -73,46 +136,180 @@ def create_final_dataframe():
     )
 
     # 24 Spalten erzeugen
-    mess_spalten = combined_df.columns.difference([
-        '% CH4 réel', 'ṁ CH4 (kg/h) Formel', 'DES (%)', 'η elec (%)', 'η therm (%)', 'Q_CH4', 'Sheet'
-    ])[:18].tolist()
-
-    final_cols = mess_spalten + [
-        '% CH4 réel', 'ṁ CH4 (kg/h) Formel', 'DES (%)', 'η elec (%)', 'η therm (%)', 'Sheet'
-    ]
     final_df = combined_df[final_cols].copy()
+    final_df.rename(columns=rename_columns, inplace=True)
+    return final_df
+
 
-    # Spaltennamen umbenennen
-    rename_columns = {
-        '% vanne gaz': "gas_valve_position_percent",
-        'AT09(%CH4)': "measured_ch4_percent",
-        'ET12(V)': "voltage",
-        'FT05(kg/h)': "diesel_mass_flow",
-        'FT07(l/min)': "water_flow",
-        'FT08(ln/min)': "ch4_volumeflow_raw",
-        'IT13(A)': "current_phase_1",
-        'IT15(A)': "current_phase_2",
-        'JT11(kW)': "power_output",
-        'PT04(bar abs)': "boost_pressure",
-        'PT16(bar abs)': "exhaust_pressure",
-        'Q CH4(ln/min)': "ch4_volumeflow",
-        'Q CO2gd(ln/min)': "co2_volumeflow_raw",
-        'Q CO2pd(ln/min)': "co2_volumeflow_processed",
-        'ST14(Hz)': "generator_frequency",
-        'TE02(°C)': "cooling_water_out_temp",
-        'TE03(°C)': "cooling_water_in_temp",
-        'TE10(°C)': "exhaust_temp",
-        '% CH4 réel': "calculated_ch4_share_percent",
-        'ṁ CH4 (kg/h) Formel': "ch4_mass_flow_calc",
-        'DES (%)': "des_percent",
-        'η elec (%)': "efficiency_electric",
-        'η therm (%)': "efficiency_thermal",
-        'Sheet': "sheet"
+def _xlsx_sheet_fingerprints(file_path):
+    """
+    Hashes every worksheet of an .xlsx/.xlsm file without parsing cell data:
+    the worksheet XML plus the shared strings it references.
+    """
+    ns = {
+        'm': "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+        'r': "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+        'rel': "http://schemas.openxmlformats.org/package/2006/relationships"
     }
-    final_df.rename(columns=rename_columns, inplace=True)
+    with zipfile.ZipFile(file_path) as archive:
+        names = set(archive.namelist())
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.findall('rel:Relationship', ns)}
+
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in names:
+            sst = ET.fromstring(archive.read('xl/sharedStrings.xml'))
+            for si in sst.findall('m:si', ns):
+                shared_strings.append(''.join(t.text or '' for t in si.iter(f"{{{ns['m']}}}t")))
+
+        fingerprints = {}
+        for sheet in workbook.find('m:sheets', ns).findall('m:sheet', ns):
+            target = targets[sheet.get(f"{{{ns['r']}}}id")]
+            part = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            xml = archive.read(part)
+
+            h = hashlib.sha256(xml)
+            for index in re.findall(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>', xml):
+                h.update(shared_strings[int(index)].encode('utf-8') + b'\0')
+            fingerprints[sheet.get('name')] = h.hexdigest()
+    return fingerprints
+
+
+def sheet_fingerprints(file_path):
+    """
+    Returns {sheet name: content fingerprint} for a workbook. Legacy .xls
+    files are not zip archives; their sheets share the file hash.
+    """
+    if zipfile.is_zipfile(file_path):
+        return _xlsx_sheet_fingerprints(file_path)
+
+    with open(file_path, 'rb') as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+    return {sheet: digest for sheet in pd.ExcelFile(file_path).sheet_names}
+
+
+def _load_manifest(manifest_path):
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def ingest_raw_directory(raw_dir=RAW_DATA_DIR, dataset_path=DATASET_PATH, manifest_path=MANIFEST_PATH):
+    """
+    Incrementally ingests all workbooks in raw_dir into the stored dataset.
+
+    The manifest keeps size, modification time and per-sheet content
+    fingerprints of every workbook. Unchanged workbooks are not opened,
+    and in changed workbooks only new or changed sheets are parsed. Their
+    cleaned rows are appended to the dataset; rows of changed, removed or
+    vanished sheets are dropped. A sheet that fails to parse is left out
+    of the manifest, so it is retried on the next run.
+
+    Parameters:
+    - raw_dir: directory with the raw Excel workbooks
+    - dataset_path: CSV with the cleaned rows and a 'source_file' column
+    - manifest_path: JSON manifest
+
+    Returns:
+    - (DataFrame, dict) dataset and summary with lists 'added', 'removed',
+      'unchanged' and 'failed' of (file, sheet) pairs
+    """
+    manifest = _load_manifest(manifest_path)
+    dataset_exists = os.path.exists(dataset_path)
+    if not dataset_exists:
+        # Without stored rows every sheet has to be parsed again
+        manifest["files"] = {}
+
+    old_files = manifest["files"]
+    new_files = {}
+    added, removed, unchanged, failed = [], [], [], []
+    new_frames = []
+
+    for file_path in list_raw_workbooks(raw_dir):
+        source = os.path.relpath(file_path, raw_dir)
+        stat = os.stat(file_path)
+        old_entry = old_files.get(source, {"sheets": {}})
+        old_sheets = old_entry["sheets"]
+
+        if old_entry.get("size") == stat.st_size and old_entry.get("mtime_ns") == stat.st_mtime_ns:
+            fingerprints = old_sheets
+        else:
+            fingerprints = sheet_fingerprints(file_path)
+
+        changed = [sheet for sheet, fp in fingerprints.items() if old_sheets.get(sheet) != fp]
+        removed += [(source, sheet) for sheet in old_sheets if sheet not in fingerprints or sheet in changed]
+        unchanged += [(source, sheet) for sheet in fingerprints if sheet not in changed]
+
+        failed_sheets = []
+        if changed:
+            excel_file = pd.ExcelFile(file_path)
+            raw_frames = []
+            for sheet in changed:
+                try:
+                    raw_frames.append(parse_sheet(excel_file, sheet))
+                    added.append((source, sheet))
+                except Exception as e:
+                    failed_sheets.append(sheet)
+                    failed.append((source, sheet))
+                    print(f"⚠️ Fehler bei {sheet} in {file_path}: {e}")
+            if raw_frames:
+                sheet_df = clean_sheet_data(raw_frames)
+                sheet_df.insert(len(sheet_df.columns), 'source_file', source)
+                new_frames.append(sheet_df)
+
+        if failed_sheets:
+            # Fehlerhafte Blätter nicht vermerken und ohne Größe/mtime, damit
+            # der nächste Lauf die Arbeitsmappe neu prüft und sie wiederholt
+            new_files[source] = {"sheets": {sheet: fp for sheet, fp in fingerprints.items()
+                                            if sheet not in failed_sheets}}
+        else:
+            new_files[source] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sheets": fingerprints}
+
+    for source, entry in old_files.items():
+        if source not in new_files:
+            removed += [(source, sheet) for sheet in entry["sheets"]]
+
+    # Datensatz aktualisieren: anhängen, oder neu schreiben wenn Zeilen wegfallen
+    os.makedirs(os.path.dirname(dataset_path) or '.', exist_ok=True)
+    frames = [pd.read_csv(dataset_path)] if dataset_exists else []
+
+    if removed and frames:
+        removed_keys = pd.MultiIndex.from_tuples(removed)
+        stored = frames[0]
+        keep = ~pd.MultiIndex.from_arrays([stored['source_file'], stored['sheet']]).isin(removed_keys)
+        frames[0] = stored[keep]
+
+    if removed or not dataset_exists:
+        dataset = pd.concat(frames + new_frames, ignore_index=True) if frames + new_frames else pd.DataFrame(
+            columns=list(rename_columns.values()) + ['source_file'])
+        dataset.to_csv(dataset_path, index=False)
+    else:
+        for sheet_df in new_frames:
+            sheet_df.to_csv(dataset_path, mode='a', header=False, index=False)
+        dataset = pd.concat(frames + new_frames, ignore_index=True)
+
+    manifest["files"] = new_files
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+
+    return dataset.reset_index(drop=True), {"added": added, "removed": removed, "unchanged": unchanged,
+                                          "failed": failed}
+
+
+def create_final_dataframe(raw_dir=RAW_DATA_DIR):
+    """
+    Ingests new or changed sheets from raw_dir and returns all cleaned rows:
+    the 24 columns of digital_twin_cleaned_24cols.csv plus 'source_file'.
+    """
+    final_df, _ = ingest_raw_directory(raw_dir)
 
     # Speichern
-    os.makedirs("outputs", exist_ok=True)
-    final_df.to_csv("outputs/digital_twin_cleaned_24cols.csv", index=False)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    final_df.drop(columns='source_file').to_csv(
+        os.path.join(OUTPUT_DIR, "digital_twin_cleaned_24cols.csv"), index=False)
 
-    return final_df
\ No newline at end of file
+    return final_df
@@ -0,0 +1,304 @@
+"""
+Inverse queries on the twin: power and DES from a fuel budget or from
+measured fuel flows.
+
+calculate_fuel_mass_flows runs forward, P -> η(P, DES) -> fuel flows. The
+inverse is answered from one table of the fuel energy input
+
+    Q_total(P, DES) = 3.6 * P / η(P, DES)      [MJ/h]
+
+on a regular (DES x power) grid. The KNN efficiency is piecewise constant
+between the measured load steps, which gives P/η a sawtooth that no table can
+invert, so the table is a smoothed monotone fit instead: the surrogate is
+evaluated at the mean power of every load step, and Q_total - 3.6 P at those
+nodes is made non-decreasing in power by isotonic regression, i.e. the
+marginal efficiency dP/dQ is capped at 100 %. A PCHIP spline (which keeps
+monotone data monotone) fills the power grid, so Q_total rises strictly with
+power and every fuel input maps to one power. The solver's own
+forward model is this table, efficiency_at(P, DES) = 3.6 P / Q_total, and
+every reported flow is computed from it with fuel_mass_flows, so the forward
+and inverse paths agree (see round_trip_check).
+
+The table is blended linearly between DES rows and searched with a
+vectorized bisection over the power nodes, followed by linear interpolation
+inside the bracketing cell. Each query costs about log2(n_power) array
+steps, whatever the batch size.
+
+Given a DES, a fuel flow fixes Q_total:
+    CH₄ budget:     Q_total = m_ch4 * PCI_ch4 / (1 - DES)
+    diesel budget:  Q_total = m_diesel * PCI_diesel / DES
+Measured diesel and CH₄ flows give DES and Q_total directly, as in
+create_final_dataframe:
+    DES = m_diesel * PCI_diesel / (m_diesel * PCI_diesel + m_ch4 * PCI_ch4)
+"""
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+from data_processing.calculate_massflows import PCI_diesel, PCI_ch4, fuel_mass_flows
+from data_processing.multi_output_model import predict_twin_outputs
+
+
+def _as_batch(*values):
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in values])
+    return [a.ravel() for a in arrays]
+
+
+def _unbatch(result, *inputs):
+    if all(np.ndim(v) == 0 for v in inputs):
+        return {key: float(value[0]) for key, value in result.items()}
+    return result
+
+
+def isotonic_rows(table, weights=None):
+    """
+    Least-squares non-decreasing fit of every row of table (pool adjacent
+    violators), optionally weighted per column.
+    """
+    table = np.asarray(table, dtype=float)
+    weights = np.ones(table.shape[1]) if weights is None else np.asarray(weights, dtype=float)
+    fitted = np.empty_like(table)
+    for r, row in enumerate(table):
+        # Blocks of pooled columns: [mean, weight, width]
+        blocks = []
+        for value, weight in zip(row, weights):
+            blocks.append([value, weight, 1])
+            while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+                v2, w2, n2 = blocks.pop()
+                v1, w1, n1 = blocks.pop()
+                blocks.append([(v1 * w1 + v2 * w2) / (w1 + w2), w1 + w2, n1 + n2])
+        fitted[r] = np.repeat([b[0] for b in blocks], [b[2] for b in blocks])
+    return fitted
+
+
+class InverseSolver:
+    """
+    Monotone fuel-input table over (DES, power) with vectorized inversion.
+
+    Parameters:
+        power_grid (array): regularly spaced power nodes [kW]
+        des_grid (array): regularly spaced DES nodes [%]
+        fuel_input (array): Q_total table [MJ/h], shape (len(des_grid), len(power_grid)),
+            non-decreasing along power (see build_inverse_solver)
+    """
+
+    def __init__(self, power_grid, des_grid, fuel_input):
+        self.power_grid = np.asarray(power_grid, dtype=float)
+        self.des_grid = np.asarray(des_grid, dtype=float)
+        # Only removes rounding wiggles of an already monotone table
+        self.fuel_input = np.maximum.accumulate(np.asarray(fuel_input, dtype=float), axis=1)
+
+        self._p0 = self.power_grid[0]
+        self._dp = self.power_grid[1] - self.power_grid[0]
+        self._d0 = self.des_grid[0]
+        self._dd = self.des_grid[1] - self.des_grid[0]
+        self._steps = int(np.ceil(np.log2(len(self.power_grid) - 1)))
+
+    def _des_rows(self, des_percent):
+        """Lower DES row index and blend weight; NaN weight outside the table."""
+        u = (des_percent - self._d0) / self._dd
+        inside = (u >= 0) & (u <= len(self.des_grid) - 1)
+        row = np.clip(np.floor(np.nan_to_num(u)), 0, len(self.des_grid) - 2).astype(np.intp)
+        weight = np.where(inside, u - row, np.nan)
+        return row, weight
+
+    def _row_values(self, row, weight, node):
+        table = self.fuel_input
+        return (1 - weight) * table[row, node] + weight * table[row + 1, node]
+
+    def power_for_fuel_input(self, Q_total, des_percent):
+        """
+        Largest power whose fuel energy input at des_percent does not exceed
+        Q_total. Inputs broadcast against each other.
+
+        Returns:
+            array of power [kW]: power_grid[-1] when the budget covers the
+            whole table, NaN when it is below the lowest power or DES is
+            outside the table
+        """
+        target, des = _as_batch(Q_total, des_percent)
+        row, weight = self._des_rows(des)
+
+        n = len(self.power_grid)
+        lo = np.zeros(len(target), dtype=np.intp)
+        hi = np.full(len(target), n - 1, dtype=np.intp)
+        v_lo = self._row_values(row, weight, lo)
+        v_hi = self._row_values(row, weight, hi)
+
+        # Bisection over the power nodes: keeps v(lo) <= target < v(hi)
+        for _ in range(self._steps):
+            mid = (lo + hi) // 2
+            v_mid = self._row_values(row, weight, mid)
+            below = v_mid <= target
+            lo = np.where(below, mid, lo)
+            v_lo = np.where(below, v_mid, v_lo)
+            hi = np.where(below, hi, mid)
+            v_hi = np.where(below, v_hi, v_mid)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.clip((target - v_lo) / (v_hi - v_lo), 0, 1)
+            power = self._p0 + (lo + frac) * self._dp
+            power = np.where(target >= v_hi, self.power_grid[-1], power)
+            v_first = self._row_values(row, weight, np.zeros_like(lo))
+            power = np.where(target < v_first * (1 - 1e-12), np.nan, power)
+        return np.where(np.isfinite(weight), power, np.nan)
+
+    def max_power_for_supply(self, ch4_kg_h=np.inf, diesel_kg_h=np.inf, des_percent=None):
+        """
+        Maximum power that a CH₄ supply (and optionally a diesel supply)
+        in kg/h can sustain.
+
+        Parameters:
+            ch4_kg_h (float or array): available CH₄ mass flow
+            diesel_kg_h (float or array): available diesel mass flow
+            des_percent (float or array): DES to run at; None searches every
+                DES of the table and returns the best one
+
+        Returns:
+            dict with 'power_output' [kW], 'des_percent' [%],
+            'diesel_mass_flow' and 'ch4_mass_flow' [kg/h] at that point
+        """
+        if des_percent is None:
+            ch4, diesel = _as_batch(ch4_kg_h, diesel_kg_h)
+            des = np.broadcast_to(self.des_grid, (len(ch4), len(self.des_grid)))
+            power = self._max_power(ch4[:, None], diesel[:, None], des)
+            best = np.argmax(np.nan_to_num(power, nan=-np.inf), axis=1)
+            pick = np.arange(len(ch4))
+            power, des = power[pick, best], des[pick, best]
+        else:
+            ch4, diesel, des = _as_batch(ch4_kg_h, diesel_kg_h, des_percent)
+            power = self._max_power(ch4, diesel, des)
+
+        # Flows at the answer, through the same forward path as the twin
+        _, _, _, m_diesel, m_ch4 = fuel_mass_flows(
+            power, self.efficiency_at(power, des) / 100, des / 100
+        )
+        result = {
+            'power_output': power,
+            'des_percent': des,
+            'diesel_mass_flow': m_diesel,
+            'ch4_mass_flow': m_ch4
+        }
+        return _unbatch(result, ch4_kg_h, diesel_kg_h, 0.0 if des_percent is None else des_percent)
+
+    def _max_power(self, ch4, diesel, des):
+        share = des / 100
+        with np.errstate(invalid='ignore', divide='ignore'):
+            budget = np.minimum(ch4 * PCI_ch4 / (1 - share), diesel * PCI_diesel / share)
+        shape = np.broadcast_shapes(budget.shape, des.shape)
+        budget = np.broadcast_to(budget, shape)
+        return self.power_for_fuel_input(budget.ravel(), np.broadcast_to(des, shape).ravel()).reshape(shape)
+
+    def operating_point_from_flows(self, diesel_kg_h, ch4_kg_h):
+        """
+        Power and DES that match measured diesel and CH₄ mass flows [kg/h].
+
+        Returns:
+            dict with 'power_output' [kW], 'des_percent' [%] and
+            'Q_total_MJ_h'; power is NaN where the point lies off the table
+        """
+        diesel, ch4 = _as_batch(diesel_kg_h, ch4_kg_h)
+        Q_diesel = diesel * PCI_diesel
+        Q_total = Q_diesel + ch4 * PCI_ch4
+        with np.errstate(invalid='ignore', divide='ignore'):
+            des = 100 * Q_diesel / Q_total
+
+        power = self.power_for_fuel_input(Q_total, des)
+        power = np.where(Q_total < self.fuel_input_at(self.power_grid[-1], des) * (1 + 1e-9), power, np.nan)
+        result = {'power_output': power, 'des_percent': des, 'Q_total_MJ_h': Q_total}
+        return _unbatch(result, diesel_kg_h, ch4_kg_h)
+
+    def fuel_input_at(self, power, des_percent):
+        """
+        Forward lookup of the monotone table, bilinear in (DES, power).
+        """
+        power, des = _as_batch(power, des_percent)
+        row, weight = self._des_rows(des)
+        u = np.clip((power - self._p0) / self._dp, 0, len(self.power_grid) - 1)
+        node = np.clip(np.floor(np.nan_to_num(u)), 0, len(self.power_grid) - 2).astype(np.intp)
+        frac = u - node
+        return ((1 - frac) * self._row_values(row, weight, node)
+                + frac * self._row_values(row, weight, node + 1))
+
+    def efficiency_at(self, power, des_percent):
+        """
+        Electrical efficiency [%] of the table, the forward model the
+        inverse queries are exact for.
+        """
+        power, des = _as_batch(power, des_percent)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 100 * 3.6 * power / self.fuel_input_at(power, des)
+
+
+def load_step_powers(model, min_power_kW=0.5, step_kW=1.0, min_samples=10):
+    """
+    Mean power of every load step in the surrogate's training data: powers
+    are grouped to step_kW and groups with fewer than min_samples rows
+    (transitions between steps) are skipped.
+    """
+    X = model.named_steps['scaler'].inverse_transform(model.named_steps['knn']._fit_X)
+    power = X[X[:, 0] >= min_power_kW, 0]
+    steps, codes, counts = np.unique(np.round(power / step_kW), return_inverse=True, return_counts=True)
+    means = np.bincount(codes, weights=power) / counts
+    return means[counts >= min_samples], counts[counts >= min_samples]
+
+
+def build_inverse_solver(model, des_range=None, n_power=257, n_des=65, min_power_kW=0.5):
+    """
+    Builds an InverseSolver from the efficiency of the multi-output surrogate
+    at the measured load steps.
+
+    Parameters:
+        model (Pipeline): fitted with train_multi_output_surrogate
+        des_range (tuple): (min, max) DES [%], defaults to the training range
+        n_power, n_des (int): grid nodes per axis
+        min_power_kW (float): idle rows below this power are ignored; there
+            the efficiency is ~0 and P/η is undefined
+
+    Returns:
+        InverseSolver covering the lowest to the highest load step
+    """
+    step_powers, step_counts = load_step_powers(model, min_power_kW)
+    if des_range is None:
+        X = model.named_steps['scaler'].inverse_transform(model.named_steps['knn']._fit_X)
+        des_range = (X[:, 1].min(), X[:, 1].max())
+
+    power_grid = np.linspace(step_powers[0], step_powers[-1], n_power)
+    des_grid = np.linspace(des_range[0], des_range[1], n_des)
+
+    # --- 1. Fuel input above 3.6 P at the load steps, monotone in power ---
+    P, D = np.meshgrid(step_powers, des_grid)
+    efficiency = predict_twin_outputs(model, P.ravel(), D.ravel())['efficiency_electric'] / 100
+    excess = (3.6 * P.ravel() / efficiency).reshape(P.shape) - 3.6 * P
+    step_excess = isotonic_rows(excess, step_counts)
+
+    # --- 2. Monotone PCHIP over the power grid ---
+    fuel_input = PchipInterpolator(step_powers, step_excess, axis=1)(power_grid) + 3.6 * power_grid
+    return InverseSolver(power_grid, des_grid, fuel_input)
+
+
+def round_trip_check(solver, n_samples=20000, seed=0):
+    """
+    Runs random (P, DES) points through the solver's forward model and
+    fuel_mass_flows and back through both inverse queries.
+
+    Returns:
+        dict with the median, p90 and max absolute power error [kW] of
+        operating_point_from_flows and max_power_for_supply, and the largest
+        relative CH₄ budget excess of max_power_for_supply
+    """
+    rng = np.random.default_rng(seed)
+    power = rng.uniform(solver.power_grid[0], solver.power_grid[-1], n_samples)
+    des = rng.uniform(solver.des_grid[0], solver.des_grid[-1], n_samples)
+    _, _, _, m_diesel, m_ch4 = fuel_mass_flows(power, solver.efficiency_at(power, des) / 100, des / 100)
+
+    from_flows = solver.operating_point_from_flows(m_diesel, m_ch4)['power_output']
+    supply = solver.max_power_for_supply(ch4_kg_h=m_ch4, des_percent=des)
+
+    result = {}
+    for name, recovered in (('flows', from_flows), ('supply', supply['power_output'])):
+        error = np.abs(recovered - power)
+        result[f'{name}_median_kW'] = float(np.median(error))
+        result[f'{name}_p90_kW'] = float(np.percentile(error, 90))
+        result[f'{name}_max_kW'] = float(np.max(error))
+    result['supply_max_budget_excess'] = float(np.max(supply['ch4_mass_flow'] / m_ch4 - 1))
+    return result
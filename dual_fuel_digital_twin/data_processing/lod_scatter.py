@@ -0,0 +1,158 @@
+"""
+Level-of-detail rendering for the measured-data layers of the dashboard.
+
+Small layers are drawn as exact scatter points. Above a threshold a layer
+is drawn as a binned density raster taken from a pyramid of 2D histograms:
+the base grid is built once from all points, coarser levels are summed
+from it on first use and cached, so the redraw cost depends on the grid
+size and not on the number of points.
+"""
+import numpy as np
+from matplotlib.colors import LinearSegmentedColormap, LogNorm, to_rgba
+
+DEFAULT_POINT_THRESHOLD = 20000
+DEFAULT_BASE_BINS = 512      # histogram cells per axis at the finest level
+DEFAULT_DISPLAY_BINS = 128   # target visible cells per axis when drawing
+
+
+class LODScatterLayer:
+    """
+    One measured x/y layer that picks exact points or a density raster
+    depending on its size.
+
+    Parameters:
+        x, y (array-like): data, non-finite pairs are dropped
+        threshold (int): maximum number of points drawn exactly
+        base_bins (int): finest histogram resolution, rounded up to a power of two
+        display_bins (int): approximate number of visible cells per axis
+        **scatter_kwargs: passed to ax.scatter (color, s, label, ...)
+    """
+
+    def __init__(self, x, y, threshold=DEFAULT_POINT_THRESHOLD, base_bins=DEFAULT_BASE_BINS,
+                 display_bins=DEFAULT_DISPLAY_BINS, **scatter_kwargs):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        finite = np.isfinite(x) & np.isfinite(y)
+        self.x = x[finite]
+        self.y = y[finite]
+        self.threshold = threshold
+        self.display_bins = display_bins
+        self.scatter_kwargs = scatter_kwargs
+
+        self._levels = {}
+        if self.use_density:
+            self._build_base_grid(int(2 ** np.ceil(np.log2(base_bins))))
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def use_density(self):
+        return len(self.x) > self.threshold
+
+    def _build_base_grid(self, bins):
+        x_min, x_max = self.x.min(), self.x.max()
+        y_min, y_max = self.y.min(), self.y.max()
+        # Avoid zero-width ranges for constant channels
+        if x_max <= x_min:
+            x_max = x_min + 1.0
+        if y_max <= y_min:
+            y_max = y_min + 1.0
+
+        counts, x_edges, y_edges = np.histogram2d(
+            self.x, self.y, bins=bins, range=[[x_min, x_max], [y_min, y_max]]
+        )
+        self._levels[0] = counts
+        self._origin = (x_min, y_min)
+        self._cell = ((x_max - x_min) / bins, (y_max - y_min) / bins)
+
+    def level_grid(self, level):
+        """
+        Returns the histogram at a zoom level, level 0 being the finest;
+        each level halves the resolution of the previous one.
+        """
+        if level not in self._levels:
+            finer = self.level_grid(level - 1)
+            n = finer.shape[0] // 2
+            self._levels[level] = finer.reshape(n, 2, n, 2).sum(axis=(1, 3))
+        return self._levels[level]
+
+    def _choose_level(self, xlim, ylim):
+        base_bins = self._levels[0].shape[0]
+        visible = min(
+            abs(xlim[1] - xlim[0]) / self._cell[0],
+            abs(ylim[1] - ylim[0]) / self._cell[1]
+        )
+        level = int(np.floor(np.log2(max(visible / self.display_bins, 1.0))))
+        return min(level, int(np.log2(base_bins)))
+
+    def draw(self, ax):
+        """
+        Draws the layer into ax for the current view limits, so set the
+        limits before calling. Returns the created artist.
+        """
+        if len(self.x) == 0:
+            return None
+        if not self.use_density:
+            return ax.scatter(self.x, self.y, **self.scatter_kwargs)
+
+        xlim = ax.get_xlim()
+        ylim = ax.get_ylim()
+        level = self._choose_level(xlim, ylim)
+        grid = self.level_grid(level)
+        cell_x = self._cell[0] * 2 ** level
+        cell_y = self._cell[1] * 2 ** level
+
+        # Only the cells inside the view are handed to imshow
+        n = grid.shape[0]
+        i0 = int(np.clip(np.floor((min(xlim) - self._origin[0]) / cell_x), 0, n))
+        i1 = int(np.clip(np.ceil((max(xlim) - self._origin[0]) / cell_x), 0, n))
+        j0 = int(np.clip(np.floor((min(ylim) - self._origin[1]) / cell_y), 0, n))
+        j1 = int(np.clip(np.ceil((max(ylim) - self._origin[1]) / cell_y), 0, n))
+        window = grid[i0:i1, j0:j1]
+
+        color = self.scatter_kwargs.get("color", "C0")
+        label = self.scatter_kwargs.get("label")
+        # Legend proxy with the same look as the exact scatter
+        ax.scatter([], [], color=color, s=self.scatter_kwargs.get("s"), label=label)
+        if window.size == 0 or not window.any():
+            return None
+
+        base = to_rgba(color)
+        dark = tuple(c * 0.35 for c in base[:3]) + (1.0,)
+        cmap = LinearSegmentedColormap.from_list("lod_density", [base, dark])
+        cmap.set_bad(alpha=0.0)
+
+        image = ax.imshow(
+            np.ma.masked_equal(window.T, 0),
+            origin='lower',
+            extent=(
+                self._origin[0] + i0 * cell_x, self._origin[0] + i1 * cell_x,
+                self._origin[1] + j0 * cell_y, self._origin[1] + j1 * cell_y
+            ),
+            aspect='auto',
+            interpolation='nearest',
+            cmap=cmap,
+            norm=LogNorm(vmin=1, vmax=max(window.max(), 1))
+        )
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        return image
+
+
+def build_measured_layers(df, threshold=DEFAULT_POINT_THRESHOLD):
+    """
+    Builds the measured layers of the three dashboard panels, keyed by the
+    y column. Build once and reuse them for every dashboard update.
+    """
+    styles = {
+        "efficiency_electric": {"label": "Measured", "color": "lightgray"},
+        "diesel_mass_flow": {"label": "Diesel Measured", "color": "lightgray"},
+        "ch4_mass_flow_calc": {"label": "CH₄ Measured", "color": "darkgray"},
+        "exhaust_temp": {"label": "Measured", "color": "lightgray"}
+    }
+    return {
+        column: LODScatterLayer(df["power_output"].values, df[column].values,
+                                threshold=threshold, s=25, **style)
+        for column, style in styles.items()
+    }
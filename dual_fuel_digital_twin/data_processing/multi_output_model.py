@@ -0,0 +1,181 @@
+import numpy as np
+from sklearn.neighbors import KNeighborsRegressor, NearestNeighbors
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import GridSearchCV
+from sklearn.metrics import make_scorer, r2_score
+
+FEATURE_COLUMNS = ['power_output', 'des_percent']
+TARGET_COLUMNS = [
+    'efficiency_electric',
+    'efficiency_thermal',
+    'exhaust_temp',
+    'boost_pressure',
+    'exhaust_pressure'
+]
+
+
+class NanAwareKNeighborsRegressor(KNeighborsRegressor):
+    """
+    Multi-output KNN that allows missing targets. The workbooks do not log
+    the same channels (24-06-26 has no PT16), so a row with a missing target
+    still serves the other targets: one neighbour search per batch, then a
+    weighted mean per target over the neighbours that have a value. Where
+    none of the k neighbours has the target, it comes from the k nearest
+    rows that have it. With complete targets it predicts exactly like
+    KNeighborsRegressor.
+    """
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self._y_missing = y
+
+        # Second index per target with gaps, over the rows that have it, for
+        # points whose k neighbours all miss the target
+        targets = y.reshape(len(y), -1)
+        self._gap_indexes = {}
+        for j in np.flatnonzero(~np.isfinite(targets).all(axis=0)):
+            present = np.flatnonzero(np.isfinite(targets[:, j]))
+            if len(present) == 0:
+                continue
+            index = NearestNeighbors(
+                n_neighbors=min(self.n_neighbors, len(present)), algorithm=self.algorithm,
+                leaf_size=self.leaf_size, metric=self.metric, p=self.p,
+                metric_params=self.metric_params
+            ).fit(X[present])
+            self._gap_indexes[j] = (index, targets[present, j])
+        return super().fit(X, np.nan_to_num(y))
+
+    def _neighbour_weights(self, dist):
+        if self.weights == 'distance':
+            # Same rule as sklearn: exact matches take all the weight
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / dist
+            exact = dist == 0
+            weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), weights)
+        else:
+            weights = np.ones_like(dist)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        dist, ind = self.kneighbors(X)
+        weights = self._neighbour_weights(dist)
+
+        y = self._y_missing.reshape(len(self._y_missing), -1)
+        predictions = np.empty((len(ind), y.shape[1]))
+
+        # Targets without gaps: plain weighted mean over the neighbours
+        complete = np.isfinite(y).all(axis=0)
+        for j in np.flatnonzero(complete):
+            predictions[:, j] = np.einsum('ik,ik->i', weights, y[ind, j])
+
+        # Targets with gaps: only the neighbours that have a value, else the
+        # nearest rows that have one
+        for j in np.flatnonzero(~complete):
+            values = y[ind, j]
+            w = weights * np.isfinite(values)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                predictions[:, j] = (w * np.nan_to_num(values)).sum(axis=1) / w.sum(axis=1)
+
+            missing = np.flatnonzero(np.isnan(predictions[:, j]))
+            if len(missing) and j in self._gap_indexes:
+                index, present_values = self._gap_indexes[j]
+                gap_dist, gap_ind = index.kneighbors(X[missing])
+                predictions[missing, j] = np.einsum(
+                    'ik,ik->i', self._neighbour_weights(gap_dist), present_values[gap_ind])
+        return predictions[:, 0] if self._y_missing.ndim == 1 else predictions
+
+
+def _nan_r2(y_true, y_pred):
+    """
+    Mean R² over the targets, each on the rows where it was measured. A
+    missing prediction for a measured row counts as a miss at the mean of
+    the measured values, so predicting nothing never scores better than
+    the R² baseline.
+    """
+    y_true = np.asarray(y_true, dtype=float).reshape(len(y_true), -1)
+    y_pred = np.asarray(y_pred, dtype=float).reshape(len(y_pred), -1)
+    scores = []
+    for j in range(y_true.shape[1]):
+        measured = np.isfinite(y_true[:, j])
+        if measured.sum() >= 2:
+            truth = y_true[measured, j]
+            predicted = np.where(np.isfinite(y_pred[measured, j]), y_pred[measured, j], truth.mean())
+            scores.append(r2_score(truth, predicted))
+    return np.mean(scores) if scores else np.nan
+
+
+def train_multi_output_surrogate(df):
+    """
+    Trains one KNN surrogate over (power_output, des_percent) that predicts
+    all twin quantities in TARGET_COLUMNS at once. A single neighbour search
+    per batch serves every target.
+
+    Rows only need valid features; a missing target is skipped for that
+    target alone. The pressures are therefore learned from the workbooks
+    that log them, the other targets from all rows.
+
+    Parameters:
+        df (DataFrame): Must contain FEATURE_COLUMNS and TARGET_COLUMNS
+
+    Returns:
+        Pipeline: fitted StandardScaler + NanAwareKNeighborsRegressor
+    """
+
+    # --- 1. Clean input: features must be finite, targets may be missing ---
+    df_clean = df[FEATURE_COLUMNS + TARGET_COLUMNS].replace([np.inf, -np.inf], np.nan)
+    df_clean = df_clean.dropna(subset=FEATURE_COLUMNS).dropna(subset=TARGET_COLUMNS, how='all')
+    X = df_clean[FEATURE_COLUMNS].values
+    y = df_clean[TARGET_COLUMNS].values
+
+    # --- 2. Pipeline with scaler and multi-output KNN ---
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('knn', NanAwareKNeighborsRegressor())
+    ])
+
+    # --- 3. Hyperparameter grid ---
+    param_grid = {
+        'knn__n_neighbors': [5, 7, 9, 10],
+        'knn__weights': ['uniform', 'distance'],
+        'knn__p': [1, 2]
+    }
+
+    # --- 4. Grid Search CV ---
+    grid_search = GridSearchCV(
+        estimator=pipeline,
+        param_grid=param_grid,
+        cv=5,
+        scoring=make_scorer(_nan_r2),
+        n_jobs=-1
+    )
+    grid_search.fit(X, y)
+
+    return grid_search.best_estimator_
+
+
+def predict_twin_outputs(model, power_output, des_percent):
+    """
+    Predicts all TARGET_COLUMNS for one or many operating points with a
+    single model call.
+
+    Parameters:
+        model (Pipeline): fitted with train_multi_output_surrogate
+        power_output (float or array): electrical power output [kW]
+        des_percent (float or array): Diesel Energy Share [%]
+
+    Returns:
+        dict: target column -> float (scalar input) or array (batch input)
+    """
+    power, des = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(power_output, dtype=float)),
+        np.asarray(des_percent, dtype=float)
+    )
+
+    predictions = model.predict(np.column_stack([power.ravel(), des.ravel()]))
+
+    if np.ndim(power_output) == 0 and np.ndim(des_percent) == 0:
+        return {col: float(predictions[0, i]) for i, col in enumerate(TARGET_COLUMNS)}
+    return {col: predictions[:, i] for i, col in enumerate(TARGET_COLUMNS)}
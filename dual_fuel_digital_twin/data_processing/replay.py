@@ -0,0 +1,290 @@
+"""
+Accelerated historical replay and residual backtest.
+
+Every measured row is run through the predictive path of the twin: the
+multi-output surrogate predicts efficiency and exhaust temperature from
+measured power and DES, fuel_mass_flows turns the efficiency into diesel and
+CH₄ flows. The predictions are compared with the measured values and
+residual statistics are reported per sheet.
+
+Rows are processed in vectorized chunks of whole sheets, spread over a
+process pool. Each chunk returns per-sheet partial sums, which are merged,
+so a sheet split across chunks is still counted correctly.
+
+The KNN query dominates the cost (~0.3M rows/s on one core). With
+method='table' the surrogate is evaluated once on a (DES x power) grid
+covering the replayed rows and every row is looked up bilinearly,
+1.2-1.5M rows/s on one core including the table build and its check.
+The table only approximates the KNN, so the backtest is approximate too:
+its deviation from the surrogate is returned with the result (see
+table_deviation). It is largest on the training rows themselves, where
+the distance-weighted KNN returns the measured value.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_processing.calculate_massflows import fuel_mass_flows
+from data_processing.multi_output_model import predict_twin_outputs
+
+# predicted quantity -> measured column
+REPLAY_QUANTITIES = {
+    'diesel_mass_flow': 'diesel_mass_flow',
+    'ch4_mass_flow': 'ch4_mass_flow_calc',
+    'exhaust_temp': 'exhaust_temp'
+}
+INPUT_COLUMNS = ['power_output', 'des_percent']
+MEASURED_COLUMNS = sorted(set(REPLAY_QUANTITIES.values()))
+TABLE_TARGETS = ['efficiency_electric', 'exhaust_temp']
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+class SurrogateTable:
+    """
+    The surrogate's efficiency and exhaust temperature on a regular
+    (DES x power) grid with vectorized bilinear lookup. Queries outside the
+    grid are clamped to its edge.
+
+    Parameters:
+        model (Pipeline): fitted multi-output surrogate
+        power_range, des_range (tuple): (min, max) covered by the grid
+        n_power, n_des (int): grid nodes per axis
+    """
+
+    def __init__(self, model, power_range, des_range, n_power=256, n_des=128):
+        self.power_grid = np.linspace(power_range[0], power_range[1], n_power)
+        self.des_grid = np.linspace(des_range[0], des_range[1], n_des)
+        P, D = np.meshgrid(self.power_grid, self.des_grid)
+        predicted = predict_twin_outputs(model, P.ravel(), D.ravel())
+        self.tables = {target: predicted[target].reshape(P.shape) for target in TABLE_TARGETS}
+
+    @staticmethod
+    def _cell(grid, values):
+        step = (grid[-1] - grid[0]) / (len(grid) - 1) if len(grid) > 1 else 1.0
+        u = np.clip((values - grid[0]) / step, 0, len(grid) - 1)
+        node = np.minimum(u.astype(np.intp), max(len(grid) - 2, 0))
+        return node, u - node
+
+    def predict(self, power, des_percent):
+        i, fi = self._cell(self.des_grid, des_percent)
+        j, fj = self._cell(self.power_grid, power)
+        result = {}
+        for target, table in self.tables.items():
+            top = table[i, j] + fj * (table[i, j + 1] - table[i, j])
+            bottom = table[i + 1, j] + fj * (table[i + 1, j + 1] - table[i + 1, j])
+            result[target] = top + fi * (bottom - top)
+        return result
+
+
+def predict_replay_chunk(model, power, des_percent):
+    """
+    Runs the twin's predictive path for arrays of measured power [kW] and
+    DES [%]. model is the surrogate or a SurrogateTable of it. Returns
+    predicted arrays keyed like REPLAY_QUANTITIES.
+    """
+    if isinstance(model, SurrogateTable):
+        predicted = model.predict(power, des_percent)
+    else:
+        predicted = predict_twin_outputs(model, power, des_percent)
+    _, _, _, m_diesel, m_ch4 = fuel_mass_flows(
+        power, predicted['efficiency_electric'] / 100, des_percent / 100
+    )
+    return {
+        'diesel_mass_flow': m_diesel,
+        'ch4_mass_flow': m_ch4,
+        'exhaust_temp': predicted['exhaust_temp']
+    }
+
+
+def _replay_chunk(chunk, model=None):
+    """
+    Replays one chunk and returns per-sheet partial sums of the residuals.
+    """
+    model = model if model is not None else _worker_model
+    codes = chunk['sheet_code'].to_numpy()
+    power = chunk['power_output'].to_numpy(dtype=float)
+    des_percent = chunk['des_percent'].to_numpy(dtype=float)
+
+    predicted = predict_replay_chunk(model, power, des_percent)
+
+    # Per-sheet sums with bincount over the codes present in this chunk
+    present, local = np.unique(codes, return_inverse=True)
+    partials = {}
+    for name, measured_col in REPLAY_QUANTITIES.items():
+        with np.errstate(invalid='ignore', divide='ignore'):
+            residual = predicted[name] - chunk[measured_col].to_numpy(dtype=float)
+        valid = np.isfinite(residual)
+        r = np.where(valid, residual, 0.0)
+        abs_r = np.abs(r)
+        maxabs = np.zeros(len(present))
+        np.maximum.at(maxabs, local, abs_r)
+        partials[name] = pd.DataFrame({
+            'n': np.bincount(local, weights=valid, minlength=len(present)),
+            'sum': np.bincount(local, weights=r, minlength=len(present)),
+            'sumsq': np.bincount(local, weights=r * r, minlength=len(present)),
+            'sumabs': np.bincount(local, weights=abs_r, minlength=len(present)),
+            'maxabs': maxabs
+        }, index=present)
+    return partials
+
+
+def _chunks_of_whole_sheets(df, chunk_size):
+    """
+    Cuts df into chunks of about chunk_size rows without splitting sheets,
+    unless a single sheet is longer than chunk_size.
+    """
+    codes = df['sheet_code'].to_numpy()
+    sheet_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    bounds = [0]
+    for start in sheet_starts[1:]:
+        if start - bounds[-1] >= chunk_size:
+            bounds.append(start)
+    bounds.append(len(df))
+
+    chunks = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        # Very long sheets are split further; the partial sums are merged later
+        for start in range(lo, hi, chunk_size):
+            chunks.append(df.iloc[start:min(start + chunk_size, hi)])
+    return chunks
+
+
+def _finish_stats(partials):
+    n = partials['n']
+    mean = partials['sum'] / n
+    return pd.DataFrame({
+        'n': n,
+        'bias': mean,
+        'std': np.sqrt(np.clip(partials['sumsq'] / n - mean ** 2, 0, None)),
+        'mae': partials['sumabs'] / n,
+        'rmse': np.sqrt(partials['sumsq'] / n),
+        'max_abs': partials['maxabs']
+    })
+
+
+def table_deviation(model, table, power, des_percent, max_samples=None, seed=0):
+    """
+    Absolute deviation of the table lookup from the surrogate at the given
+    points, per target: dict of median, p99 and max. With max_samples, a
+    random subset of at most that many points is compared.
+    """
+    if max_samples is not None and len(power) > max_samples:
+        pick = np.random.default_rng(seed).choice(len(power), max_samples, replace=False)
+        power, des_percent = power[pick], des_percent[pick]
+    exact = predict_twin_outputs(model, power, des_percent)
+    looked_up = table.predict(power, des_percent)
+    result = {}
+    for target in TABLE_TARGETS:
+        deviation = np.abs(looked_up[target] - exact[target])
+        result[target] = {
+            'median': float(np.median(deviation)),
+            'p99': float(np.percentile(deviation, 99)),
+            'max': float(deviation.max())
+        }
+    return result
+
+
+def replay_backtest(df, model, chunk_size=262144, max_workers=None, min_power_kW=0.5,
+                    method='exact', table_size=(256, 128), deviation_samples=20000):
+    """
+    Replays all measured rows through the twin and reports residual
+    statistics (prediction - measurement) per sheet.
+
+    Parameters:
+        df (DataFrame): cleaned data from create_final_dataframe
+        model (Pipeline): fitted multi-output surrogate
+        chunk_size (int): rows per vectorized chunk
+        max_workers (int): process pool size, None = number of CPUs, 1 = in-process
+        min_power_kW (float): rows below this power are skipped; at idle the
+            efficiency is ~0 and the fuel flows from P/η are undefined
+        method (str): 'exact' queries the KNN for every row, 'table' looks
+            the rows up in a SurrogateTable over their (power, DES) range
+        table_size (tuple): (n_power, n_des) nodes for method='table'
+        deviation_samples (int): replayed rows on which the table is
+            compared with the surrogate for method='table'
+
+    Returns:
+        dict with
+        - 'per_sheet': DataFrame indexed by sheet with columns
+          '<quantity>_<n|bias|std|mae|rmse|max_abs>'
+        - 'overall': the same statistics over all rows (Series)
+        - 'samples', 'seconds', 'samples_per_second' (including the table
+          build and its check)
+        - 'table_deviation' (method='table' only): see table_deviation,
+          None when no row was replayed
+    """
+    if method not in ('exact', 'table'):
+        raise ValueError(f"Unknown replay method: {method!r}")
+    start = time.perf_counter()
+
+    # --- 1. Select rows and encode sheets ---
+    keys = ['source_file', 'sheet'] if 'source_file' in df.columns else ['sheet']
+    data = df[keys + INPUT_COLUMNS + MEASURED_COLUMNS]
+    data = data[np.isfinite(data[INPUT_COLUMNS]).all(axis=1) & (data['power_output'] >= min_power_kW)]
+    # Factorize each key column once and combine the integer codes; much
+    # cheaper than grouping on the string columns together
+    codes = np.zeros(len(data), dtype=np.int64)
+    levels = []
+    for key in keys:
+        key_codes, uniques = pd.factorize(data[key], use_na_sentinel=False)
+        codes = codes * len(uniques) + key_codes
+        levels.append(uniques)
+    codes, combined = pd.factorize(codes)
+    data = data.assign(sheet_code=codes)
+    sheet_index = pd.MultiIndex.from_arrays([
+        np.asarray(uniques)[(combined // int(np.prod([len(u) for u in levels[i + 1:]]))) % len(uniques)]
+        for i, uniques in enumerate(levels)
+    ], names=keys)
+
+    deviation = None
+    if method == 'table' and len(data):
+        power = data['power_output'].to_numpy()
+        des = data['des_percent'].to_numpy()
+        table = SurrogateTable(model, (power.min(), power.max()), (des.min(), des.max()),
+                               *table_size)
+        deviation = table_deviation(model, table, power, des, deviation_samples)
+        model = table
+
+    # --- 2. Replay in chunks, in parallel ---
+    chunks = _chunks_of_whole_sheets(data, chunk_size)
+    if max_workers == 1 or len(chunks) <= 1:
+        results = [_replay_chunk(chunk, model) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(model,)) as pool:
+            results = list(pool.map(_replay_chunk, chunks))
+
+    # --- 3. Merge partial sums (empty when no row was replayed) ---
+    per_sheet = []
+    overall = {}
+    for name in REPLAY_QUANTITIES:
+        parts = pd.concat([result[name] for result in results]) if results else pd.DataFrame(
+            {column: pd.Series(dtype=float) for column in ('n', 'sum', 'sumsq', 'sumabs', 'maxabs')})
+        merged = parts.groupby(level=0).agg({'n': 'sum', 'sum': 'sum', 'sumsq': 'sum',
+                                             'sumabs': 'sum', 'maxabs': 'max'})
+        merged.index = sheet_index[merged.index.to_numpy()]
+        merged['n'] = merged['n'].astype(np.int64)
+        stats = _finish_stats(merged)
+        per_sheet.append(stats.add_prefix(f"{name}_"))
+        total = merged.agg({'n': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'sumabs': 'sum', 'maxabs': 'max'})
+        overall.update(_finish_stats(total.to_frame().T).iloc[0].add_prefix(f"{name}_").to_dict())
+
+    seconds = time.perf_counter() - start
+    result = {
+        'per_sheet': pd.concat(per_sheet, axis=1),
+        'overall': pd.Series(overall),
+        'samples': len(data),
+        'seconds': seconds,
+        'samples_per_second': len(data) / seconds if seconds > 0 else float('inf')
+    }
+    if method == 'table':
+        result['table_deviation'] = deviation
+    return result
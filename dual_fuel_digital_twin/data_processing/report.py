@@ -0,0 +1,421 @@
+"""
+Headless report pipeline.
+
+Renders every figure of the project (scatter grids, correlation heatmap,
+actual-vs-predicted plots and the dashboard panels) with the Agg backend to
+PNG/SVG files. Figures are rendered in a process pool, and a figure is
+skipped when the fingerprint of its input data matches the previous run.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from data_processing.extract_excel_data import create_final_dataframe, list_raw_workbooks
+from data_processing.calculate_massflows import calculate_fuel_mass_flows
+from data_processing.correlation import draw_correlation_heatmap
+from data_processing.dashboard_plots import draw_dashboard_panels
+from data_processing.exhaust_temp_model import train_exhaust_temp_model
+from data_processing.multi_output_model import train_multi_output_surrogate, predict_twin_outputs
+from data_processing.steady_state import select_steady_state
+
+# Bump when a builder changes so that all figures are re-rendered
+RENDER_VERSION = 1
+
+FINGERPRINT_FILE = "fingerprints.json"
+
+# (power kW, DES %) points shown in the dashboard figures, GUI defaults first
+DASHBOARD_POINTS = [(10.0, 15.0)]
+
+# Raw sheet layout (see eleceff1.py, eleceff2.py, powerout1.py)
+FIRST_LINE_INDICES = [10, 12, 14, 16, 20]  # K, M, O, Q, U in rows 1/2
+AVERAGE_INDICES = list(range(1, 19))       # B to S in row 26
+EFFICIENCY_COL_INDEX = 16                  # Q2 = η elec (%)
+POWER_COL_INDEX = 9                        # J26 = average power output
+
+
+# ---------------------------------------------------------------------------
+# Data loading
+# ---------------------------------------------------------------------------
+
+def load_sheet_summaries(file_path):
+    """
+    Reads the per-sheet summary values of a workbook once for all scatter
+    grids: the first-line values (rows 1/2), the average row (row 26) with
+    its labels (row 4), η elec from Q2 and the average power from J26.
+    Values are keyed by their labels because the column order differs
+    between workbooks.
+
+    Returns:
+        dict with DataFrames 'first_line' and 'averages' and Series
+        'efficiency' and 'power'
+    """
+    first_line_rows = []
+    average_rows = []
+    efficiencies = []
+    powers = []
+
+    xls = pd.ExcelFile(file_path)
+    for sheet_name in xls.sheet_names:
+        df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+        try:
+            headers = df.iloc[0, FIRST_LINE_INDICES].tolist()
+            values = df.iloc[1, FIRST_LINE_INDICES].tolist()
+            first_line_rows.append(dict(zip(headers, values)))
+
+            labels = df.iloc[3, AVERAGE_INDICES].tolist()
+            values = df.iloc[25, AVERAGE_INDICES].tolist()
+            average_rows.append(dict(zip(labels, values)))
+            efficiencies.append(df.iloc[1, EFFICIENCY_COL_INDEX])
+            powers.append(df.iloc[25, POWER_COL_INDEX])
+        except IndexError:
+            continue  # skip malformed sheets
+
+    return {
+        "first_line": pd.DataFrame(first_line_rows),
+        "averages": pd.DataFrame(average_rows),
+        "efficiency": pd.Series(efficiencies, name="η elec (%)"),
+        "power": pd.Series(powers, name="Avg Power Output")
+    }
+
+
+def _concat_summaries(summaries):
+    return {
+        "first_line": pd.concat([s["first_line"] for s in summaries], ignore_index=True),
+        "averages": pd.concat([s["averages"] for s in summaries], ignore_index=True),
+        "efficiency": pd.concat([s["efficiency"] for s in summaries], ignore_index=True),
+        "power": pd.concat([s["power"] for s in summaries], ignore_index=True)
+    }
+
+
+# ---------------------------------------------------------------------------
+# Figure builders (module level so that they can run in worker processes)
+# ---------------------------------------------------------------------------
+
+def build_first_line_scatter(payload):
+    """η elec (%) vs each first-line value (as in eleceff1.py)."""
+    combined_df = payload["first_line"]
+    target = "η elec (%)"
+    features = [col for col in combined_df.columns if col != target]
+
+    fig = Figure(figsize=(6 * len(features), 5))
+    axes = fig.subplots(1, len(features), squeeze=False)[0]
+    for ax, feature in zip(axes, features):
+        ax.scatter(combined_df[feature], combined_df[target])
+        ax.set_xlabel(feature)
+        ax.set_ylabel(target)
+        ax.set_title(f"{target} vs {feature}")
+        ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def build_average_scatter_grid(payload):
+    """Target vs every average-row value in a grid of six columns (eleceff2.py, powerout1.py)."""
+    features_df = payload["averages"]
+    target = payload["target"]
+    label = payload["label"]
+    n_rows = max(1, -(-len(features_df.columns) // 6))
+
+    fig = Figure(figsize=(18, 3 * n_rows))
+    axes = fig.subplots(n_rows, 6, squeeze=False).flatten()
+    for i, feature in enumerate(features_df.columns):
+        axes[i].scatter(features_df[feature], target)
+        axes[i].set_xlabel(feature, fontsize=8)
+        axes[i].set_ylabel(label, fontsize=8)
+        axes[i].set_title(f"{payload['title_prefix']} vs {feature}", fontsize=9)
+        axes[i].tick_params(labelsize=8)
+        axes[i].grid(True)
+
+    # Remove unused axes if any
+    for j in range(len(features_df.columns), len(axes)):
+        fig.delaxes(axes[j])
+    # Fixed spacing; tight_layout costs seconds on an 18-axes grid
+    fig.subplots_adjust(left=0.04, right=0.99, bottom=0.06, top=0.96, wspace=0.35, hspace=0.6)
+    return fig
+
+
+def build_correlation_heatmap(payload):
+    """Correlation heatmap of all numeric columns (as in correlation.py)."""
+    corr_matrix = payload["data"].select_dtypes(include='number').corr()
+
+    fig = Figure(figsize=(14, 10))
+    ax = fig.subplots()
+    draw_correlation_heatmap(ax, corr_matrix, payload["title"])
+    fig.tight_layout()
+    return fig
+
+
+def build_actual_vs_predicted(payload):
+    """Actual vs predicted values over power (as in create_plots_LR_KNRR.py)."""
+    x = payload["x"]
+    order = np.argsort(x)
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    ax.scatter(x, payload["y"], color='blue', label='Actual Values', alpha=0.6)
+    ax.scatter(x, payload["y_pred"], color='red', label='Predicted Values', marker='x')
+    ax.plot(x[order], payload["y_pred"][order], color='gray', linestyle='--', label='Model')
+    ax.set_title(payload["title"])
+    ax.set_xlabel("Power Output (kW)")
+    ax.set_ylabel(payload["ylabel"])
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def build_dashboard(payload):
+    """The three GUI dashboard panels for one operating point."""
+    fig = Figure(figsize=(18, 5), dpi=100)
+    draw_dashboard_panels(
+        fig, payload["data"], payload["power"], payload["des_percent"],
+        payload["predicted_eff"], payload["mass_flows"], payload["predicted_temp"]
+    )
+    return fig
+
+
+BUILDERS = {
+    "first_line_scatter": build_first_line_scatter,
+    "average_scatter_grid": build_average_scatter_grid,
+    "correlation_heatmap": build_correlation_heatmap,
+    "actual_vs_predicted": build_actual_vs_predicted,
+    "dashboard": build_dashboard
+}
+
+
+# ---------------------------------------------------------------------------
+# Job collection
+# ---------------------------------------------------------------------------
+
+def _summary_jobs(prefix, summary):
+    return [
+        {
+            "name": f"{prefix}/elec eff vs values in first line",
+            "builder": "first_line_scatter",
+            "payload": {"first_line": summary["first_line"]}
+        },
+        {
+            "name": f"{prefix}/elec eff vs all averages",
+            "builder": "average_scatter_grid",
+            "payload": {
+                "averages": summary["averages"],
+                "target": summary["efficiency"],
+                "label": "η elec (%)",
+                "title_prefix": "η elec (%)"
+            }
+        },
+        {
+            "name": f"{prefix}/Power Output vs all averages",
+            "builder": "average_scatter_grid",
+            "payload": {
+                "averages": summary["averages"],
+                "target": summary["power"],
+                "label": "Avg Power Output",
+                "title_prefix": "Power"
+            }
+        }
+    ]
+
+
+def collect_report_jobs(df, file_paths, surrogate=None, exhaust_model=None,
+                        dashboard_points=DASHBOARD_POINTS):
+    """
+    Builds the list of figure jobs for a report.
+
+    Scatter grids are produced per workbook (campaign) and for all campaigns
+    combined; the model figures need the fitted models and are skipped when
+    they are not given.
+
+    Parameters:
+        df (DataFrame): cleaned data from create_final_dataframe
+        file_paths (list): raw workbooks
+        surrogate (Pipeline): fitted multi-output surrogate, optional
+        exhaust_model (LinearRegression): fitted exhaust model, optional
+        dashboard_points (list): (power kW, DES %) pairs for the dashboards
+
+    Returns:
+        list of job dicts with 'name', 'builder' and 'payload'
+    """
+    jobs = []
+
+    summaries = []
+    for file_path in file_paths:
+        summary = load_sheet_summaries(file_path)
+        summaries.append(summary)
+        campaign = os.path.splitext(os.path.basename(file_path))[0]
+        jobs.extend(_summary_jobs(campaign, summary))
+    if summaries:
+        jobs.extend(_summary_jobs("all", _concat_summaries(summaries)))
+
+    jobs.append({
+        "name": "all/correlation matrix",
+        "builder": "correlation_heatmap",
+        "payload": {"data": df.select_dtypes(include='number'), "title": "Correlation Matrix"}
+    })
+
+    measured = df[['power_output', 'des_percent', 'efficiency_electric',
+                   'diesel_mass_flow', 'ch4_mass_flow_calc', 'exhaust_temp']].dropna()
+
+    if exhaust_model is not None:
+        x = measured['power_output'].values
+        jobs.append({
+            "name": "all/exhaust temp actual vs predicted",
+            "builder": "actual_vs_predicted",
+            "payload": {
+                "x": x,
+                "y": measured['exhaust_temp'].values,
+                "y_pred": exhaust_model.predict(x.reshape(-1, 1)),
+                "title": "Actual vs Predicted Exhaust Temperature",
+                "ylabel": "Exhaust Temperature (°C)"
+            }
+        })
+
+    if surrogate is not None:
+        predicted = predict_twin_outputs(surrogate, measured['power_output'].values,
+                                         measured['des_percent'].values)
+        jobs.append({
+            "name": "all/efficiency actual vs predicted",
+            "builder": "actual_vs_predicted",
+            "payload": {
+                "x": measured['power_output'].values,
+                "y": measured['efficiency_electric'].values,
+                "y_pred": predicted['efficiency_electric'],
+                "title": "Actual vs Predicted Electrical Efficiency",
+                "ylabel": "Efficiency (%)"
+            }
+        })
+
+        for power, des_percent in dashboard_points:
+            result = predict_twin_outputs(surrogate, power, des_percent)
+            predicted_eff = result["efficiency_electric"] / 100
+            jobs.append({
+                "name": f"all/dashboard {power:g} kW {des_percent:g} DES",
+                "builder": "dashboard",
+                "payload": {
+                    "data": measured,
+                    "power": power,
+                    "des_percent": des_percent,
+                    "predicted_eff": predicted_eff,
+                    "mass_flows": calculate_fuel_mass_flows(power, predicted_eff, des_percent / 100),
+                    "predicted_temp": result["exhaust_temp"]
+                }
+            })
+
+    return jobs
+
+
+# ---------------------------------------------------------------------------
+# Fingerprinting and rendering
+# ---------------------------------------------------------------------------
+
+def _update_hash(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj):
+            h.update(repr(key).encode())
+            _update_hash(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _update_hash(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint_job(job, formats):
+    """
+    Returns a hex digest of a job's builder, input data and output formats.
+    """
+    h = hashlib.sha256()
+    _update_hash(h, [RENDER_VERSION, job["builder"], list(formats), job["payload"]])
+    return h.hexdigest()
+
+
+def _render_job(job, output_dir, formats, dpi):
+    fig = BUILDERS[job["builder"]](job["payload"])
+    FigureCanvasAgg(fig)
+
+    base = os.path.join(output_dir, job["name"])
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    for fmt in formats:
+        fig.savefig(f"{base}.{fmt}", format=fmt, dpi=dpi)
+    return job["name"]
+
+
+def render_report(jobs, output_dir="outputs/reports", formats=("png", "svg"), dpi=100,
+                  max_workers=None, force=False):
+    """
+    Renders figure jobs to files, in parallel, skipping unchanged figures.
+
+    Parameters:
+        jobs (list): from collect_report_jobs
+        output_dir (str): target directory
+        formats (tuple): file formats understood by savefig
+        dpi (int): raster resolution
+        max_workers (int): process pool size, None = number of CPUs
+        force (bool): re-render even if the fingerprint is unchanged
+
+    Returns:
+        dict with lists 'rendered' and 'skipped' (figure names)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    fingerprint_path = os.path.join(output_dir, FINGERPRINT_FILE)
+    previous = {}
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as file:
+            previous = json.load(file)
+
+    fingerprints = {}
+    pending = []
+    skipped = []
+    for job in jobs:
+        fingerprint = fingerprint_job(job, formats)
+        fingerprints[job["name"]] = fingerprint
+        outputs_exist = all(
+            os.path.exists(os.path.join(output_dir, f"{job['name']}.{fmt}")) for fmt in formats
+        )
+        if not force and previous.get(job["name"]) == fingerprint and outputs_exist:
+            skipped.append(job["name"])
+        else:
+            pending.append(job)
+
+    rendered = []
+    if len(pending) == 1 or max_workers == 1:
+        rendered = [_render_job(job, output_dir, formats, dpi) for job in pending]
+    elif pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_render_job, job, output_dir, formats, dpi) for job in pending]
+            rendered = [future.result() for future in futures]
+
+    with open(fingerprint_path, 'w') as file:
+        json.dump(fingerprints, file, indent=2, sort_keys=True)
+
+    return {"rendered": rendered, "skipped": skipped}
+
+
+def generate_report(file_paths=None, output_dir="outputs/reports", formats=("png", "svg"),
+                    max_workers=None, force=False):
+    """
+    Loads the data, fits the twin models and renders the full report.
+    By default all workbooks in data/raw are included.
+    """
+    if file_paths is None:
+        file_paths = list_raw_workbooks()
+    df = create_final_dataframe()
+    train_df = select_steady_state(df)
+    jobs = collect_report_jobs(
+        df, file_paths,
+        surrogate=train_multi_output_surrogate(train_df),
+        exhaust_model=train_exhaust_temp_model(train_df)
+    )
+    return render_report(jobs, output_dir, formats, max_workers=max_workers, force=force)
@@ -0,0 +1,255 @@
+"""
+Buffered, append-only structured log of twin predictions.
+
+Every query is logged with its inputs, outputs, model version and latency
+as one JSON line. log() and log_batch() only put the record on an
+in-memory queue and never wait: when the queue is full the record is
+counted as dropped. A daemon thread takes the queued records in batches and
+writes them to the current file, and starts a new file before a line would
+take it past max_bytes. Every file is created exclusively by one writer, so
+files are never shared, reopened, overwritten or deleted. NaN and infinite
+values are stored as null, keeping every line valid JSON.
+"""
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import queue
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+LOG_DIR = os.path.join("outputs", "prediction_log")
+LOG_PREFIX = "predictions"
+
+
+def model_version(model):
+    """
+    Short content hash of a fitted model, so every log record can be traced
+    back to the model that produced it.
+    """
+    return hashlib.sha256(pickle.dumps(model)).hexdigest()[:12]
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _finite(value):
+    """Copy of value with NaN/inf floats replaced by None."""
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_finite(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def _dumps(record):
+    try:
+        return json.dumps(record, default=_to_json, ensure_ascii=False, allow_nan=False)
+    except ValueError:
+        return json.dumps(_finite(record), default=_to_json, ensure_ascii=False, allow_nan=False)
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+class PredictionLog:
+    """
+    Parameters:
+        directory (str): folder of the JSONL files, created if missing
+        prefix (str): file name prefix
+        max_bytes (int): file size limit; a new file is started before a line
+            would exceed it (a single longer line gets a file of its own)
+        batch_size (int): maximum records written per batch
+        flush_interval (float): seconds the writer waits for more records
+            before writing a partial batch
+        max_queue (int): buffered records before new ones are dropped
+    """
+
+    def __init__(self, directory=LOG_DIR, prefix=LOG_PREFIX, max_bytes=10 * 1024 ** 2,
+                 batch_size=1000, flush_interval=1.0, max_queue=100000):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._sequence = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @property
+    def path(self):
+        """File currently appended to (None before the first write)."""
+        return self._path
+
+    def _put(self, item):
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def log(self, inputs, outputs, model_version=None, latency_ms=None, **extra):
+        """
+        Queues one prediction record. Returns False if it was dropped.
+
+        Parameters:
+            inputs (dict): query inputs, e.g. power_output and des_percent
+            outputs (dict): predicted and calculated quantities
+            model_version (str): see model_version()
+            latency_ms (float): time taken by the query
+            **extra: further fields stored with the record
+        """
+        record = {
+            'timestamp': _utc_now(),
+            'model_version': model_version,
+            'latency_ms': latency_ms,
+            'inputs': inputs,
+            'outputs': outputs,
+            **extra
+        }
+        return self._put(('record', record))
+
+    def log_batch(self, inputs, outputs, model_version=None, latency_ms=None, **extra):
+        """
+        Queues a batch of predictions as one item; the writer thread splits
+        it into one record per row.
+
+        Parameters:
+            inputs, outputs (dict): name -> array, all of the same length
+            latency_ms (float): time taken by the whole batch
+        """
+        batch = {
+            'timestamp': _utc_now(),
+            'model_version': model_version,
+            'batch_latency_ms': latency_ms,
+            'inputs': inputs,
+            'outputs': outputs,
+            **extra
+        }
+        return self._put(('batch', batch))
+
+    def flush(self):
+        """
+        Blocks until everything queued so far is written. Meant for the end
+        of a batch run, not for the GUI thread.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes the remaining records and stops the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(('stop', None))
+        self._writer.join()
+
+    # --- Writer thread ---
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for kind, payload in items:
+                if kind == 'stop':
+                    stop = True
+                elif kind == 'record':
+                    lines.append(_dumps(payload))
+                else:
+                    lines.extend(self._batch_lines(payload))
+            try:
+                if lines:
+                    self._write(lines)
+            except OSError:
+                # A failing disk must not stop the writer or the caller
+                self.dropped += len(lines)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+        if self._file is not None:
+            self._file.close()
+
+    def _batch_lines(self, batch):
+        inputs = {k: np.atleast_1d(np.asarray(v)) for k, v in batch.pop('inputs').items()}
+        outputs = {k: np.atleast_1d(np.asarray(v)) for k, v in batch.pop('outputs').items()}
+        size = len(next(iter(inputs.values())))
+        batch['batch_size'] = size
+        lines = []
+        for i in range(size):
+            record = dict(batch)
+            record['inputs'] = {k: v[i] for k, v in inputs.items()}
+            record['outputs'] = {k: v[i] for k, v in outputs.items()}
+            lines.append(_dumps(record))
+        return lines
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._file.close()
+        # Start time, process id and sequence number; 'x' never reuses an
+        # existing file, e.g. of another instance in the same process
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        while True:
+            self._sequence += 1
+            name = f"{self.prefix}_{stamp}_{os.getpid()}_{self._sequence:04d}.jsonl"
+            try:
+                self._file = open(os.path.join(self.directory, name), 'x', encoding='utf-8')
+                break
+            except FileExistsError:
+                continue
+        self._path = self._file.name
+        self._size = 0
+
+    def _write(self, lines):
+        chunk = []
+        for line in lines:
+            size = len(line.encode('utf-8')) + 1
+            if self._file is None or (self._size > 0 and self._size + size > self.max_bytes):
+                if chunk:
+                    self._file.write("".join(chunk))
+                    chunk = []
+                self._open_next_file()
+            chunk.append(line + "\n")
+            self._size += size
+        self._file.write("".join(chunk))
+        self._file.flush()
+        self.written += len(lines)
+
@@ -0,0 +1,250 @@
+"""
+Global sensitivity analysis (Sobol and Morris) of the twin.
+
+The inputs are the operating point (power, DES), the constants of the
+derived-quantity formulas in create_final_dataframe (PCI_diesel, PCI_ch4,
+rho_ch4) and the CO₂ dilution reading Q CO2pd. One evaluation is:
+
+1. The twin at the nominal constants gives the efficiency at (power, DES)
+   and, with fuel_mass_flows, the diesel and CH₄ flows; from those the
+   sensor readings FT05 [kg/h] and FT08 [ln/min] are reconstructed.
+2. The readings are processed again with the sampled constants and CO₂
+   dilution, exactly as create_final_dataframe does, giving the derived CH₄
+   flow, DES and electrical efficiency.
+3. The twin is queried at (power, derived DES) for its efficiency and
+   exhaust temperature.
+
+So the indices tell how much the operating point and how much the
+processing constants drive the quantities the twin is trained on and
+predicts. Samples are evaluated in vectorized chunks across a process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from data_processing.calculate_massflows import fuel_mass_flows
+from data_processing.extract_excel_data import PCI_diesel, PCI_ch4, rho_ch4, Vm_ch4
+from data_processing.multi_output_model import predict_twin_outputs
+
+# Input -> (lower, upper) bound, sampled uniformly
+SENSITIVITY_INPUTS = {
+    'power_output': (2.0, 14.0),                        # kW, mapped load range
+    'des_percent': (5.0, 13.0),                         # %
+    'PCI_diesel': (PCI_diesel * 0.98, PCI_diesel * 1.02),   # MJ/kg, ±2 %
+    'PCI_ch4': (PCI_ch4 * 0.98, PCI_ch4 * 1.02),            # MJ/kg, ±2 %
+    'rho_ch4': (rho_ch4 * 0.97, rho_ch4 * 1.03),            # ±3 %
+    'co2_dilution': (0.0, 20.0)                         # Q CO2pd [ln/min]
+}
+# CO₂ dilution the sensor readings are reconstructed with (Q CO2pd is 0 in the mapping data)
+NOMINAL_CO2_DILUTION = 0.0
+
+SENSITIVITY_OUTPUTS = [
+    'efficiency_electric',      # derived from the readings, %
+    'des_percent_derived',      # %
+    'ch4_mass_flow_calc',       # kg/h
+    'predicted_efficiency',     # twin at the derived DES, %
+    'exhaust_temp'              # twin at the derived DES, °C
+]
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _ch4_mass_flow(ft08, rho, co2, pci_ch4):
+    """'ṁ CH4 (kg/h) Formel' of create_final_dataframe for FT08 in ln/min."""
+    q_ch4 = ft08 * 0.001 * 60 * rho * pci_ch4
+    ch4_share = q_ch4 / (q_ch4 + co2)
+    return ft08 * 0.001 * 60 * ch4_share * (rho / Vm_ch4)
+
+
+def _ft08_from_ch4_mass_flow(m_ch4, rho, co2, pci_ch4):
+    """
+    Inverse of _ch4_mass_flow: the positive root of
+    k a F² - m a F - m co2 = 0 with a = 0.06 rho PCI_ch4 and k = 0.06 rho / Vm.
+    """
+    a = 0.06 * rho * pci_ch4
+    k = 0.06 * rho / Vm_ch4
+    return (m_ch4 * a + np.sqrt((m_ch4 * a) ** 2 + 4 * k * a * m_ch4 * co2)) / (2 * k * a)
+
+
+def evaluate_twin_sensitivity(X, model=None):
+    """
+    Evaluates SENSITIVITY_OUTPUTS for a sample matrix.
+
+    Parameters:
+        X (array): shape (n, 6), columns in the order of SENSITIVITY_INPUTS
+        model (Pipeline): fitted multi-output surrogate
+
+    Returns:
+        array of shape (n, len(SENSITIVITY_OUTPUTS))
+    """
+    model = model if model is not None else _worker_model
+    power, des, pci_diesel, pci_ch4, rho, co2 = np.asarray(X, dtype=float).T
+
+    # --- 1. Sensor readings at the nominal constants ---
+    efficiency = predict_twin_outputs(model, power, des)['efficiency_electric'] / 100
+    _, _, _, ft05, m_ch4 = fuel_mass_flows(power, efficiency, des / 100)
+    ft08 = _ft08_from_ch4_mass_flow(m_ch4, rho_ch4, NOMINAL_CO2_DILUTION, PCI_ch4)
+
+    # --- 2. Derived quantities with the sampled constants ---
+    m_ch4_derived = _ch4_mass_flow(ft08, rho, co2, pci_ch4)
+    q_diesel = ft05 * pci_diesel
+    q_total = q_diesel + m_ch4_derived * pci_ch4
+    des_derived = 100 * q_diesel / q_total
+    efficiency_derived = 100 * power / (q_total / 3.6)
+
+    # --- 3. Twin at the derived operating point ---
+    predicted = predict_twin_outputs(model, power, des_derived)
+
+    return np.column_stack([
+        efficiency_derived,
+        des_derived,
+        m_ch4_derived,
+        predicted['efficiency_electric'],
+        predicted['exhaust_temp']
+    ])
+
+
+def evaluate_samples(X, model, chunk_size=65536, max_workers=None):
+    """
+    Evaluates a sample matrix in chunks, in parallel unless max_workers is 1
+    or there is only one chunk.
+    """
+    chunks = [X[start:start + chunk_size] for start in range(0, len(X), chunk_size)]
+    if max_workers == 1 or len(chunks) <= 1:
+        return np.vstack([evaluate_twin_sensitivity(chunk, model) for chunk in chunks])
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(model,)) as pool:
+        return np.vstack(list(pool.map(evaluate_twin_sensitivity, chunks)))
+
+
+def _scale(unit_samples, bounds):
+    lower = np.array([b[0] for b in bounds.values()])
+    upper = np.array([b[1] for b in bounds.values()])
+    return lower + unit_samples * (upper - lower)
+
+
+def _interval(estimates, confidence):
+    tail = 100 * (1 - confidence) / 2
+    return np.percentile(estimates, [tail, 100 - tail], axis=0)
+
+
+def sobol_indices(model, n_base=8192, bounds=None, n_bootstrap=200, confidence=0.95,
+                  chunk_size=65536, max_workers=None, seed=0):
+    """
+    First-order (S1) and total (ST) Sobol indices with the Saltelli sampling
+    scheme: n_base * (d + 2) evaluations for d inputs. S1 uses the Saltelli
+    (2010) estimator and ST the Jansen estimator; confidence intervals are
+    percentile bootstraps over the base samples.
+
+    Parameters:
+        model (Pipeline): fitted multi-output surrogate
+        n_base (int): base samples, a power of two for the Sobol sequence
+        bounds (dict): input -> (lower, upper), defaults to SENSITIVITY_INPUTS
+        n_bootstrap (int): bootstrap resamples for the intervals
+        confidence (float): interval level
+        seed (int): seed of the scrambled Sobol sequence and the bootstrap
+
+    Returns:
+        dict: output -> DataFrame indexed by input with columns
+        S1, S1_low, S1_high, ST, ST_low, ST_high
+    """
+    bounds = SENSITIVITY_INPUTS if bounds is None else bounds
+    d = len(bounds)
+
+    # --- 1. Saltelli sample matrices A, B and A with column i from B ---
+    unit = qmc.Sobol(2 * d, scramble=True, seed=seed).random(n_base)
+    A = _scale(unit[:, :d], bounds)
+    B = _scale(unit[:, d:], bounds)
+    AB = np.repeat(A[None], d, axis=0)
+    for i in range(d):
+        AB[i, :, i] = B[:, i]
+
+    # --- 2. Evaluate all blocks in one batch ---
+    X = np.vstack([A, B, AB.reshape(-1, d)])
+    Y = evaluate_samples(X, model, chunk_size, max_workers)
+    f_A = Y[:n_base]
+    f_B = Y[n_base:2 * n_base]
+    f_AB = Y[2 * n_base:].reshape(d, n_base, -1)
+
+    # --- 3. Estimators on the full sample and on bootstrap resamples ---
+    def estimate(idx):
+        a, b, ab = f_A[idx], f_B[idx], f_AB[:, idx]
+        variance = np.var(np.concatenate([a, b], axis=-2), axis=-2)
+        s1 = np.mean(b * (ab - a), axis=-2) / variance
+        st = 0.5 * np.mean((a - ab) ** 2, axis=-2) / variance
+        return s1, st
+
+    s1, st = estimate(np.arange(n_base))
+    rng = np.random.default_rng(seed)
+    resamples = [estimate(rng.integers(0, n_base, n_base)) for _ in range(n_bootstrap)]
+    s1_low, s1_high = _interval(np.array([r[0] for r in resamples]), confidence)
+    st_low, st_high = _interval(np.array([r[1] for r in resamples]), confidence)
+
+    inputs = list(bounds)
+    return {
+        output: pd.DataFrame({
+            'S1': s1[:, j], 'S1_low': s1_low[:, j], 'S1_high': s1_high[:, j],
+            'ST': st[:, j], 'ST_low': st_low[:, j], 'ST_high': st_high[:, j]
+        }, index=inputs)
+        for j, output in enumerate(SENSITIVITY_OUTPUTS)
+    }
+
+
+def morris_indices(model, n_trajectories=1000, levels=4, bounds=None, n_bootstrap=200,
+                   confidence=0.95, chunk_size=65536, max_workers=None, seed=0):
+    """
+    Morris elementary-effects screening: n_trajectories * (d + 1)
+    evaluations. Each trajectory starts on a random grid point and moves one
+    input at a time, in random order, by delta = levels / (2 (levels - 1))
+    of its range. Effects are per full input range.
+
+    Returns:
+        dict: output -> DataFrame indexed by input with columns
+        mu_star, mu_star_low, mu_star_high, mu, sigma
+    """
+    bounds = SENSITIVITY_INPUTS if bounds is None else bounds
+    d = len(bounds)
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+
+    # --- 1. Trajectories in the unit cube ---
+    start = rng.integers(0, levels, (n_trajectories, d)) / (levels - 1)
+    step = np.where(start + delta <= 1, delta, -delta)
+    order = np.argsort(rng.random((n_trajectories, d)), axis=1)
+    moves = np.zeros((n_trajectories, d, d))
+    rows = np.arange(n_trajectories)[:, None]
+    moves[rows, np.arange(d)[None, :], order] = step[rows, order]
+    trajectories = start[:, None, :] + np.concatenate(
+        [np.zeros((n_trajectories, 1, d)), np.cumsum(moves, axis=1)], axis=1
+    )
+
+    # --- 2. Evaluate and form the elementary effects ---
+    X = _scale(trajectories.reshape(-1, d), bounds)
+    Y = evaluate_samples(X, model, chunk_size, max_workers).reshape(n_trajectories, d + 1, -1)
+    changes = (Y[:, 1:] - Y[:, :-1]) / step[rows, order][:, :, None]
+    effects = np.empty_like(changes)
+    effects[rows, order] = changes
+
+    # --- 3. Statistics with bootstrap interval for mu_star ---
+    mu_star = np.abs(effects).mean(axis=0)
+    resamples = np.array([
+        np.abs(effects[rng.integers(0, n_trajectories, n_trajectories)]).mean(axis=0)
+        for _ in range(n_bootstrap)
+    ])
+    low, high = _interval(resamples, confidence)
+
+    inputs = list(bounds)
+    return {
+        output: pd.DataFrame({
+            'mu_star': mu_star[:, j], 'mu_star_low': low[:, j], 'mu_star_high': high[:, j],
+            'mu': effects.mean(axis=0)[:, j], 'sigma': effects.std(axis=0, ddof=1)[:, j]
+        }, index=inputs)
+        for j, output in enumerate(SENSITIVITY_OUTPUTS)
+    }
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# Per-channel floors for the rolling standard deviation and the least-squares
+# slope per sample (the mapping sheets are logged at 1 Hz, so per second).
+# The actual limits scale with the noise of each sheet (see
+# tag_steady_state); the floors only matter for very quiet sheets.
+# JT11 = power_output, FT05 = diesel_mass_flow, FT08 = ch4_volumeflow_raw,
+# TE10 = exhaust_temp
+STEADY_STATE_CRITERIA = {
+    'power_output': {'std_floor': 0.1, 'slope_floor': 0.02},          # kW, kW/s
+    'diesel_mass_flow': {'std_floor': 0.1, 'slope_floor': 0.015},     # kg/h, kg/h/s
+    'ch4_volumeflow_raw': {'std_floor': 2.0, 'slope_floor': 0.3},     # ln/min, ln/min/s
+    'exhaust_temp': {'std_floor': 1.5, 'slope_floor': 0.25}           # °C, °C/s
+}
+# Window std limit in multiples of the sheet noise
+NOISE_STD_FACTOR = 3.0
+# Slope limit in standard errors of the window slope under the sheet noise
+NOISE_SLOPE_FACTOR = 3.0
+
+
+def _sheet_segments(df):
+    """
+    Numbers the contiguous runs of rows that come from one sheet. Sheet names
+    repeat across workbooks, so the name alone is not a key.
+    """
+    if 'source_file' in df.columns:
+        key = df['source_file'].astype(str) + '\0' + df['sheet'].astype(str)
+    else:
+        key = df['sheet'].astype(str)
+    return (key != key.shift()).cumsum().values
+
+
+def _window_sums(values, lo, hi):
+    """
+    Sums values[lo[i]:hi[i]] for every row with one cumulative sum.
+    """
+    csum = np.concatenate([[0.0], np.cumsum(values)])
+    return csum[hi] - csum[lo]
+
+
+def _sheet_noise(x, segments):
+    """
+    Robust noise standard deviation of x per sheet, from the MAD of the
+    first differences. Differencing removes a ramp and the median ignores
+    a step, so transients inside a sheet do not inflate it.
+    """
+    dx = pd.Series(x).groupby(segments).diff()
+    deviation = (dx - dx.groupby(segments).transform('median')).abs()
+    return 1.4826 / np.sqrt(2) * deviation.groupby(segments).transform('median').to_numpy()
+
+
+def tag_steady_state(df, window=11, criteria=None):
+    """
+    Tags every row as steady or transient from rolling-window statistics of
+    the channels in criteria, computed within each sheet.
+
+    A row is steady when, for every channel, the standard deviation and the
+    absolute least-squares slope over the centred window are within limits
+    relative to the noise of the sheet: the std within NOISE_STD_FACTOR
+    noise std, the slope within NOISE_SLOPE_FACTOR standard errors of a
+    slope fitted to pure noise. Each sheet is a held operating point, so
+    its noise is estimated robustly from the sheet itself; the channel
+    floors apply when the sheet is quieter than that. Windows are truncated
+    at the sheet edges; rows whose window has fewer than three valid
+    samples are transient. All window statistics come from cumulative
+    sums, so the cost is O(n).
+
+    Parameters:
+        df (DataFrame): cleaned data with 'sheet' and the criteria channels
+        window (int): centred window length in samples (rounded up to odd)
+        criteria (dict): channel -> {'std_floor', 'slope_floor'}, defaults
+            to STEADY_STATE_CRITERIA
+
+    Returns:
+        DataFrame: copy of df with a boolean 'steady_state' column
+    """
+    if criteria is None:
+        criteria = STEADY_STATE_CRITERIA
+
+    # --- 1. Window bounds, truncated at the sheet edges ---
+    segments = _sheet_segments(df)
+    n = len(segments)
+    idx = np.arange(n)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = segments[1:] != segments[:-1]
+    seg_start = np.maximum.accumulate(np.where(is_start, idx, 0))
+    is_end = np.ones(n, dtype=bool)
+    is_end[:-1] = is_start[1:]
+    seg_end = np.minimum.accumulate(np.where(is_end, idx + 1, n)[::-1])[::-1]
+
+    half = window // 2
+    lo = np.maximum(idx - half, seg_start)
+    hi = np.minimum(idx + half + 1, seg_end)
+
+    # Time within the sheet keeps the sums small
+    t = (idx - seg_start).astype(float)
+
+    # --- 2. Per-channel window moments ---
+    steady = np.ones(n, dtype=bool)
+    for channel, limits in criteria.items():
+        x = df[channel].to_numpy(dtype=float)
+        valid = np.isfinite(x)
+        # Centre each sheet on its mean to avoid cancellation in the sums
+        offset = pd.Series(np.where(valid, x, np.nan)).groupby(segments).transform('mean').to_numpy()
+        xc = np.where(valid, x - offset, 0.0)
+        tv = np.where(valid, t, 0.0)
+
+        count = _window_sums(valid.astype(float), lo, hi)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_x = _window_sums(xc, lo, hi) / count
+            mean_t = _window_sums(tv, lo, hi) / count
+            var_x = _window_sums(xc * xc, lo, hi) / count - mean_x ** 2
+            var_t = _window_sums(tv * tv, lo, hi) / count - mean_t ** 2
+            cov_tx = _window_sums(tv * xc, lo, hi) / count - mean_t * mean_x
+
+            std = np.sqrt(np.clip(var_x * count / (count - 1), 0, None))
+            slope = cov_tx / var_t
+
+            # Standard error of the slope is noise / sqrt(sum((t - mean_t)^2))
+            noise = _sheet_noise(x, segments)
+            max_std = np.maximum(NOISE_STD_FACTOR * noise, limits['std_floor'])
+            max_slope = np.maximum(NOISE_SLOPE_FACTOR * noise / np.sqrt(var_t * count),
+                                   limits['slope_floor'])
+
+        steady &= (count >= 3) & (std <= max_std) & (np.abs(slope) <= max_slope)
+
+    tagged = df.copy()
+    tagged['steady_state'] = steady
+    return tagged
+
+
+def select_steady_state(df, window=11, criteria=None):
+    """
+    Returns only the steady-state rows of df, for model fitting.
+    """
+    tagged = tag_steady_state(df, window, criteria)
+    return tagged[tagged['steady_state']].drop(columns='steady_state')
@@ -0,0 +1,137 @@
+"""
+Dependency-free runtime for the digital twin on the engine controller.
+
+Loads the JSON artifact written by data_processing.export_models and
+evaluates the same (power, DES) multi-output KNN surrogate the GUI, report,
+replay and inverse solver use (multi_output_model), plus the mass-flow
+model, with the Python standard library only. Do not import numpy, pandas
+or sklearn here.
+"""
+import json
+
+from data_processing.calculate_massflows import calculate_fuel_mass_flows
+
+ARTIFACT_FORMAT = "dual_fuel_twin_artifact"
+ARTIFACT_VERSION = 3   # 3: multi-output (power, DES) surrogate
+
+# Below this power the engine idles: the efficiency is ~0 and P/η undefined
+MIN_POWER_KW = 0.5
+MASS_FLOW_KEYS = ("Q_total_MJ_h", "Q_diesel_MJ_h", "Q_ch4_MJ_h",
+                  "diesel_mass_flow_kg_h", "ch4_mass_flow_kg_h")
+
+
+def load_twin_artifact(path="outputs/twin_artifact.json"):
+    """
+    Reads a twin artifact and checks its format marker and version.
+    """
+    with open(path) as file:
+        artifact = json.load(file)
+
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not a digital twin artifact")
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"{path} has artifact version {artifact.get('version')}, "
+                         f"expected {ARTIFACT_VERSION}; export it again")
+
+    return artifact
+
+
+def _distance(a, b, p):
+    if p == 1:
+        return sum(abs(u - v) for u, v in zip(a, b))
+    if p == 2:
+        return sum((u - v) ** 2 for u, v in zip(a, b)) ** 0.5
+    return sum(abs(u - v) ** p for u, v in zip(a, b)) ** (1.0 / p)
+
+
+def _nearest(distances, rows, k):
+    """
+    The k nearest of rows as (distance, row, slot) triples.
+
+    Ties at the k-th distance occur (repeated operating points). sklearn
+    then picks among the tied points in tree order, which cannot be
+    reproduced here. Instead all tied points share the remaining neighbour
+    slots equally, which does not depend on any order. The exporter measures
+    the resulting deviation from sklearn (see export_models.knn_parity).
+    """
+    ranked = sorted((distances[i], i) for i in rows)
+    k = min(k, len(ranked))
+    d_k = ranked[k - 1][0]
+    inside = [(d, i, 1.0) for d, i in ranked if d < d_k]
+    tied = [(d, i) for d, i in ranked if d == d_k]
+    share = (k - len(inside)) / len(tied)
+    return inside + [(d, i, share) for d, i in tied]
+
+
+def _neighbour_weights(neighbours, weights):
+    """
+    (row, weight) pairs of the neighbours. With distance weights exact
+    matches take all the weight (as in sklearn).
+    """
+    if weights == "distance":
+        exact = [(i, slot) for d, i, slot in neighbours if d == 0]
+        if exact:
+            return exact
+        return [(i, slot / d) for d, i, slot in neighbours]
+    return [(i, slot) for d, i, slot in neighbours]
+
+
+def predict_knn(model, features):
+    """
+    Predicts all targets of an exported multi-output KNN model for one point.
+
+    Brute-force neighbour search over the scaled training points. A target
+    is the weighted mean over the k neighbours that have a value for it;
+    if none of the weighted neighbours has one, over the k nearest rows that
+    have it (as multi_output_model.NanAwareKNeighborsRegressor).
+
+    Returns:
+        list of predictions in the order of model["targets"]
+    """
+    q = [(x - mean) / scale for x, mean, scale
+         in zip(features, model["scaler_mean"], model["scaler_scale"])]
+    xs = model["x"]
+    k = model["n_neighbors"]
+    distances = [_distance(point, q, model["p"]) for point in xs]
+    weighted = _neighbour_weights(_nearest(distances, range(len(xs)), k), model["weights"])
+
+    predictions = []
+    for column in model["y"]:
+        pairs = [(w, column[i]) for i, w in weighted if column[i] is not None]
+        if not pairs:
+            rows = (i for i, value in enumerate(column) if value is not None)
+            pairs = [(w, column[i]) for i, w in
+                     _neighbour_weights(_nearest(distances, rows, k), model["weights"])]
+        predictions.append(sum(w * value for w, value in pairs) / sum(w for w, _ in pairs))
+    return predictions
+
+
+def evaluate_twin(artifact, power_output_kW, des_percent, min_power_kW=MIN_POWER_KW):
+    """
+    Runs the full twin for one operating point.
+
+    Parameters:
+        artifact (dict): loaded with load_twin_artifact
+        power_output_kW (float): electrical power output [kW]
+        des_percent (float): Diesel Energy Share [%]
+        min_power_kW (float): below this power, or at zero predicted
+            efficiency, the fuel mass flows are NaN instead of P/η
+
+    Returns:
+        dict: predicted efficiency and exhaust temperature, all surrogate
+        targets under 'twin_outputs', and the fuel mass flows
+    """
+    model = artifact["twin_model"]
+    outputs = dict(zip(model["targets"], predict_knn(model, (power_output_kW, des_percent))))
+    predicted_eff = outputs["efficiency_electric"]
+    if power_output_kW < min_power_kW or not predicted_eff > 0:
+        mass_flows = {key: float("nan") for key in MASS_FLOW_KEYS}
+    else:
+        mass_flows = calculate_fuel_mass_flows(power_output_kW, predicted_eff / 100, des_percent / 100)
+
+    return {
+        "predicted_efficiency": predicted_eff,
+        "predicted_exhaust_temp": outputs["exhaust_temp"],
+        "twin_outputs": outputs,
+        **mass_flows
+    }
@@ -1,7 +1,9 @@
 from data_processing.gui import run_interactive_gui
 from data_processing.extract_excel_data import create_final_dataframe
 from data_processing.correlation import analyze_dataframe_correlation
+from data_processing.report import generate_report
 if __name__ == "__main__":
     #df= create_final_dataframe()
     #analyze_dataframe_correlation(df)
+    #generate_report()
     run_interactive_gui()
\ No newline at end of file